@@ -1,9 +1,14 @@
 import os
 import subprocess
 import json
-import configparser
 import sys
 import shlex
+import time
+import threading
+import arGUIments_core as core
+from arGUIments_core import (file_stamp, load_settings, open_profiles, build_command,
+                             read_text, process_group_args, kill_process_group, wait_process,
+                             start_program, run_local, record_run_or_warn)
 
 if hasattr(sys, '_MEIPASS'):
     BASE_DIR = sys._MEIPASS
@@ -11,103 +16,454 @@ else:
     BASE_DIR = os.path.abspath(".")
     
     
-PROFILE_FILE = "profiles.json"
-SETTINGS_FILE = "settings.ini"
-
-
-def load_settings():
-    # config = configparser.ConfigParser()
-    config = configparser.ConfigParser(interpolation=None)
-    if not os.path.exists(SETTINGS_FILE):
-        config['DEFAULT'] = {
-            'software_path': 'yt-dlp',
-            'output_flag': '--output',
-            'output_folder': '',
-            'filename_template': '%(title)s.%(ext)s',
-            # 'use_custom_output': 'False'
-        }
-        with open(SETTINGS_FILE, 'w') as f:
-            config.write(f)
-    else:
-        config.read(SETTINGS_FILE)
-    return config
-    
-def load_profiles():
-    if os.path.exists(PROFILE_FILE):
-        with open(PROFILE_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-    
-profiles = load_profiles()
-settings = load_settings()
+SOCKET_FILE = "arGUIments.sock"
+
+# Files are looked up in the current folder (see arGUIments_core.set_config_dir)
+PROFILE_FILE = core.PROFILE_FILE
+PROFILE_DB = core.PROFILE_DB
+SETTINGS_FILE = core.SETTINGS_FILE
+
+# ============ BATCH MODE ============
+# --batch FILE|- reads one invocation per line: "shortname arg1 arg2 ...", or
+# only the arguments when the shortname is given on the command line. Lines
+# are read lazily by a pool of --jobs workers, so a huge list never sits in
+# memory and the first commands start right away.
+BATCH_USAGE = "Usage: arGUIments-console.py --batch FILE|- [--jobs N] [shortname]"
+
+def iter_batch(source, shortname=None):
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            tokens = shlex.split(line)
+        except ValueError as e:
+            yield number, None, [], f"Invalid line: {e}"
+            continue
+        if shortname:
+            yield number, shortname, tokens, None
+        else:
+            yield number, tokens[0], tokens[1:], None
+
+def run_batch(source, jobs, shortname=None):
+    items = iter_batch(source, shortname)
+    items_lock = threading.Lock()
+    print_lock = threading.Lock()
+    results = []  # (line number, shortname, exit code or error message)
 
-def build_command(shortname, user_args):
-      
-    profile = profiles.get(shortname)
-    if not profile:
-        raise ValueError("Profile not found.")
+    def output(prefix, data):
+        with print_lock:
+            sys.stdout.buffer.write(prefix + data)
+            sys.stdout.buffer.flush()
 
-    command_template = profile['command_template']
+    def worker():
+        while True:
+            with items_lock:
+                try:
+                    number, name, args, error = next(items)
+                except StopIteration:
+                    return
+            prefix = f"[{number}:{name}] ".encode()
+            if error is None:
+                command = None
+                try:
+                    command = build_command(name, args)
+                    started = time.time()
+                    # stdin is not inherited: with "--batch -" it is the list itself
+                    process = start_program(name, command, {'stdin': subprocess.DEVNULL, 'stdout': subprocess.PIPE,
+                                                            'stderr': subprocess.STDOUT})
+                    size = 0
+                    for line in process.stdout:
+                        size += len(line)
+                        output(prefix, line if line.endswith(b'\n') else line + b'\n')
+                    usage = wait_process(process)
+                    returncode = process.returncode
+                    if isinstance(process, core.ProcessChain):
+                        output(prefix, f"[Stages: {process.status()}]\n".encode())
+                    record_run_or_warn(name, args, command, started, returncode, size, usage=usage)
+                    results.append((number, name, returncode))
+                    continue
+                except Exception as e:
+                    error = str(e)
+                    if command:
+                        record_run_or_warn(name, args, command, started, None)
+            output(prefix, f"[ERROR] {error}\n".encode())
+            results.append((number, name, error))
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(jobs)]
+    for t in workers:
+        t.start()
     try:
-        args = shlex.split(command_template.format(*user_args))
-    except IndexError as e:
-        raise ValueError(f"Missing arguments: {e}")
+        for t in workers:
+            while t.is_alive():
+                t.join(0.5)  # stay responsive to Ctrl+C
+    except KeyboardInterrupt:
+        print("\nBatch interrupted by user.")
+    return print_batch_summary(results)
 
-    path_mode = profile.get("path_mode", "default")
-    
-    if path_mode == "default":
-        software_path = settings['DEFAULT'].get('software_path')
-    elif path_mode == "custom":
-        software_path = profile.get("program_path")
-    
-    if not software_path:
-        raise ValueError("Software path is not defined in settings or in profile.")
-    
-    command = [software_path] + args
+def print_batch_summary(results):
+    statuses = {}
+    for number, name, status in results:
+        key = status if isinstance(status, int) else 'error'
+        statuses[key] = statuses.get(key, 0) + 1
+    failed = sorted((r for r in results if r[2] != 0), key=lambda r: r[0])
+    print(f"\n[Batch finished] {len(results)} jobs, {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    for status, count in sorted(statuses.items(), key=lambda x: str(x[0])):
+        print(f"  exit {status}: {count}")
+    for number, name, status in failed:
+        print(f"  line {number} ({name}): {status if isinstance(status, str) else f'exit code {status}'}")
+    return 1 if failed else 0
+
+def parse_batch_args(argv):
+    # Only leading options are ours, everything after the shortname is left alone
+    source, jobs = None, os.cpu_count() or 1
+    i = 0
+    while i < len(argv) and argv[i].startswith('--'):
+        if argv[i] == '--batch' and i + 1 < len(argv):
+            source = argv[i + 1]
+        elif argv[i] == '--jobs' and i + 1 < len(argv) and argv[i + 1].isdigit():
+            jobs = max(1, int(argv[i + 1]))
+        else:
+            raise ValueError(BATCH_USAGE)
+        i += 2
+    shortname = argv[i] if i < len(argv) else None
+    return source, jobs, shortname
 
+# ============ DAEMON MODE ============
+# --daemon keeps the profiles and settings loaded and runs profiles for
+# clients connecting to a Unix socket (arGUIments.sock in the current folder
+# by default), so scripts calling a profile hundreds of times don't pay for
+# starting Python and reading the config files every time. --connect sends
+# the invocation to the daemon and prints the output as it arrives.
+#
+# Protocol: the client sends one JSON line {"shortname", "args", "cwd"}, the
+# daemon answers with JSON lines {"out": text} / {"err": text} as the program
+# writes, then {"exit": code} or {"error": message}, and closes the connection.
+DAEMON_USAGE = "Usage: arGUIments-console.py --daemon [--socket PATH]\n" \
+               "       arGUIments-console.py [--socket PATH] --connect shortname [args...]"
 
-    flag = None
-    exportmode = profile.get("export_output_mode")
-    if exportmode == "default":
-        flag = settings['DEFAULT'].get('output_flag')
-    elif exportmode == "custom":
-        flag = profile.get("custom_output_flag")       
-    
-    folder = None
-    mode = profile.get("export_mode", "default")
-    if mode == "default":
-        folder = settings['DEFAULT'].get('output_folder')
-    elif mode == "software":
-        folder = ''
-    elif mode == "custom":
-        folder = profile.get("custom_output_folder", "")        
-        
-    template = None
-    template_name = profile.get("filename_mode")
-    if template_name == "default":
-        template = settings['DEFAULT'].get('filename_template')
-    elif template_name == "custom":
-        template = profile.get("custom_filename_template")       
-        
-        
-    if exportmode != "disable":
-        if folder == "":
-            command += [flag, f"{template}"]
+# Held while a client's program is being started too, so that reload_config
+# doesn't close the profile store under it
+config_lock = threading.RLock()
+config_stamp = None
+
+def reload_config():
+    # Pick up edits made by the GUI (or by hand) without restarting the daemon
+    global config_stamp
+    with config_lock:
+        stamp = (file_stamp(PROFILE_FILE), file_stamp(SETTINGS_FILE))
+        if stamp != config_stamp:
+            settings = {'DEFAULT': dict(load_settings(create=False)['DEFAULT'])}  # plain dict: faster lookups
+            previous = core.profiles
+            core.settings, core.profiles = settings, open_profiles(settings)
+            if hasattr(previous, 'close'):  # the SQLite store
+                previous.close()
+            config_stamp = stamp
+
+class DaemonClient:
+    def __init__(self, connection):
+        self.connection = connection
+        self.send_lock = threading.Lock()
+        self.output_bytes = {'out': 0, 'err': 0}
+        self.stopped = False  # killed because the client went away
+        self.done = False     # the last message was sent
+        self.last_output = 0  # time.monotonic() of the last chunk sent
+
+    def handle(self):
+        with self.connection:
+            self.serve()
+
+    def serve(self):
+        try:
+            with self.connection.makefile('rb') as rfile:
+                request = json.loads(rfile.readline())
+            with config_lock:
+                reload_config()
+                command = build_command(request['shortname'], request.get('args', []))
+                started = time.time()
+                # Own process group, so stopping it also stops whatever it started
+                popen_args = dict(process_group_args(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, cwd=request.get('cwd') or None)
+                self.process = start_program(request['shortname'], command, popen_args)
+        except Exception as e:
+            self.send_last({'error': str(e)})
+            return
+        threading.Thread(target=self.watch, daemon=True).start()
+        readers = [threading.Thread(target=self.relay, args=(self.process.stdout, 'out'), daemon=True),
+                   threading.Thread(target=self.relay, args=(self.process.stderr, 'err'), daemon=True)]
+        for t in readers:
+            t.start()
+        usage = wait_process(self.process)
+        returncode = self.process.returncode
+        # Like core.run: a grandchild that inherited the pipes may keep them
+        # open long after the program exited, and isn't waited for. Output
+        # still coming (a slow client) is, though.
+        self.last_output = time.monotonic()
+        while any(t.is_alive() for t in readers):
+            if time.monotonic() - self.last_output > core.RUN_DRAIN_TIMEOUT:
+                break
+            for t in readers:
+                t.join(0.1)
+        if isinstance(self.process, core.ProcessChain):
+            self.send_quietly({'err': f"[Stages: {self.process.status()}]\n"})
+        record_run_or_warn(request['shortname'], request.get('args', []), command, started, returncode,
+                           sum(self.output_bytes.values()), self.stopped, usage)
+        self.send_last({'exit': returncode})
+
+    def watch(self):
+        # The client never sends anything after the request, so the end of
+        # the stream means it went away (Ctrl+C): don't leave the program
+        # running. Unless send_last shut the connection down.
+        try:
+            self.connection.recv(1)
+        except OSError:
+            pass
+        if not self.done:
+            self.stop()
+
+    def relay(self, pipe, key):
+        def count(data):
+            self.output_bytes[key] += len(data)
+
+        try:
+            for text in read_text(pipe, count):
+                self.send({key: text})
+                self.last_output = time.monotonic()
+        except OSError:
+            self.stop()  # client went away
+        finally:
+            pipe.close()
+
+    def stop(self):
+        # Not poll(): serve() reaps the program with wait_process
+        if self.process.returncode is None:
+            self.stopped = True
+            kill_process_group(self.process)
+
+    def send(self, message):
+        with self.send_lock:
+            if self.done:
+                return  # late output of a grandchild, after the exit message
+            self.connection.sendall(json.dumps(message).encode() + b'\n')
+
+    def send_quietly(self, message):
+        try:
+            self.send(message)
+        except OSError:
+            pass
+
+    def send_last(self, message):
+        # Then the client reads the end of the stream, and watch() returns
+        import socket
+        self.send_quietly(message)
+        with self.send_lock:
+            self.done = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def run_daemon(path):
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ValueError("Daemon mode needs Unix domain sockets, which this platform does not provide.")
+    if os.path.exists(path):
+        # Left over by a daemon that didn't exit cleanly, unless one still answers
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise ValueError(f"A daemon is already listening on {path}")
+        except ConnectionRefusedError:
+            os.unlink(path)
+        finally:
+            probe.close()
+    reload_config()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    # Whoever can connect runs any profile as this user: only this user,
+    # whatever the umask. Nothing can connect before listen().
+    os.chmod(path, 0o600)
+    server.listen(64)
+    print(f"Listening on {path} (Ctrl+C to stop)")
+    try:
+        while True:
+            connection, _ = server.accept()
+            threading.Thread(target=DaemonClient(connection).handle, daemon=True).start()
+    except KeyboardInterrupt:
+        print("\nDaemon stopped.")
+    finally:
+        server.close()
+        os.unlink(path)
+    return 0
+
+def run_client(path, shortname, args):
+    import socket
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    request = {'shortname': shortname, 'args': args, 'cwd': os.getcwd()}
+    client.sendall(json.dumps(request).encode() + b'\n')
+    with client, client.makefile('rb') as replies:
+        for line in replies:
+            message = json.loads(line)
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+                sys.stdout.flush()
+            elif 'err' in message:
+                sys.stderr.write(message['err'])
+                sys.stderr.flush()
+            elif 'exit' in message:
+                return message['exit']
+            elif 'error' in message:
+                print(f"[ERROR] {message['error']}")
+                return 1
+    print("[ERROR] The daemon closed the connection.")
+    return 1
+
+def parse_daemon_args(argv):
+    # Returns (mode, socket path, remaining args)
+    path = SOCKET_FILE
+    i = 0
+    while i < len(argv) and argv[i] == '--socket' and i + 1 < len(argv):
+        path = argv[i + 1]
+        i += 2
+    if i < len(argv) and argv[i] in ('--daemon', '--connect'):
+        return argv[i], path, argv[i + 1:]
+    raise ValueError(DAEMON_USAGE)
+
+# ============ RUN HISTORY ============
+# Every run (single, batch or daemon) is added to history.db, unless
+# keep_history is off. --stats prints the figures per profile, and the last
+# runs too when given a shortname; --days N only counts the last N days.
+STATS_USAGE = "Usage: arGUIments-console.py --stats [--days N] [shortname]"
+
+def parse_stats_args(argv):
+    days, shortname = None, None
+    i = 0
+    while i < len(argv):
+        if argv[i] == '--days' and i + 1 < len(argv):
+            try:
+                days = float(argv[i + 1])
+            except ValueError:
+                raise ValueError(STATS_USAGE)
+            i += 2
+        elif shortname is None and not argv[i].startswith('--'):
+            shortname = argv[i]
+            i += 1
         else:
-            command += [flag, f"{folder}/{template}"]
-        
-    return command
-    
+            raise ValueError(STATS_USAGE)
+    return shortname, days
+
+def print_stats(shortname, days):
+    from run_history import format_duration, format_bytes, STATS_RECENT_RUNS
+    history = core.open_history(core.settings)
+    if history is None:
+        print("The history is off (keep_history in settings.ini).")
+        return 0
+    stats = history.stats(shortname, days)
+    if not stats:
+        print("No runs recorded" + (f" for {shortname}" if shortname else "") + (f" in the last {days:g} days" if days else "") + ".")
+        return 0
+    print(f"{'Profile':20} {'Runs':>6} {'Failed':>12} {'Stopped':>8} {'Median':>8} {'95th pct':>9} {'Recent med.':>11} "
+          f"{'Avg output':>11} {'Avg CPU':>8} {'Peak mem.':>10}  Last run")
+    for s in stats:
+        failed = '-' if s['failure_rate'] is None else f"{s['failures']} ({s['failure_rate']:.0%})"
+        cpu = '-' if s['mean_cpu_cores'] is None else f"{s['mean_cpu_cores']:.0%}"
+        last_run = time.strftime('%Y-%m-%d %H:%M', time.localtime(s['last_run']))
+        print(f"{s['profile']:20} {s['runs']:>6} {failed:>12} {s['stopped']:>8} {format_duration(s['p50']):>8} "
+              f"{format_duration(s['p95']):>9} {format_duration(s['recent_p50']):>11} "
+              f"{format_bytes(s['mean_output_bytes']):>11} {cpu:>8} {format_bytes(s['max_rss']):>10}  {last_run}")
+    print(f"(Recent median: the last {STATS_RECENT_RUNS} runs of each profile. "
+          f"Avg CPU: CPU time per second of run time, 100% being one core busy)")
+    if shortname:
+        print(f"\nLast runs of {shortname}:")
+        for run in history.recent(shortname):
+            started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['started']))
+            status = 'stopped' if run['stopped'] else 'failed to start' if run['returncode'] is None else f"exit {run['returncode']}"
+            args = shlex.join(run['args']) if run['args'] is not None else ''
+            usage = run['usage']
+            cpu = '-' if usage is None else format_duration(usage['user_time'] + usage['system_time'])
+            memory = format_bytes(usage and usage['max_rss'])
+            print(f"  {started}  {format_duration(run['duration']):>8}  {format_bytes(run['output_bytes']):>9}  "
+                  f"CPU {cpu:>7}  {memory:>9}  {status:16} {args}")
+    return 0
+
+# ============ PROFILE STORE ============
+# --import-profiles FILE adds the profiles of a profiles.json file to the
+# SQLite store (profiles.db), --export-profiles FILE writes the store back
+# out in the profiles.json format.
+def transfer_profiles(mode, path):
+    from profile_store import ProfileStore
+    store = ProfileStore(PROFILE_DB)
+    try:
+        if mode == '--import-profiles':
+            print(f"Imported {store.import_json(path)} profiles from {path} into {PROFILE_DB}")
+        else:
+            print(f"Exported {store.export_json(path)} profiles from {PROFILE_DB} to {path}")
+    finally:
+        store.close()
+    return 0
+
 if __name__ == "__main__":
     
 # ========= COMMAND-LINE MODE ===========
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] in ('--import-profiles', '--export-profiles'):
+        if len(sys.argv) != 3:
+            print(f"Usage: arGUIments-console.py {sys.argv[1]} FILE")
+            sys.exit(2)
+        try:
+            sys.exit(transfer_profiles(sys.argv[1], sys.argv[2]))
+        except (ValueError, OSError) as e:
+            print(f"[ERROR] {e}")
+            sys.exit(2)
+    elif len(sys.argv) > 1 and sys.argv[1] in ('--daemon', '--connect', '--socket'):
+        try:
+            mode, path, rest = parse_daemon_args(sys.argv[1:])
+            if mode == '--daemon':
+                sys.exit(run_daemon(path))
+            if not rest:
+                raise ValueError(DAEMON_USAGE)
+            try:
+                try:
+                    sys.exit(run_client(path, rest[0], rest[1:]))
+                except (FileNotFoundError, ConnectionRefusedError):
+                    # No daemon: run it here instead so scripts keep working
+                    print(f"[No daemon on {path}, running locally]", file=sys.stderr)
+                    core.load_config()
+                    sys.exit(run_local(rest[0], rest[1:]))
+            except KeyboardInterrupt:
+                print("\nProcess interrupted by user.")
+                sys.exit(130)
+        except (ValueError, OSError, subprocess.SubprocessError) as e:
+            print(f"[ERROR] {e}")
+            sys.exit(2)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--stats':
+        try:
+            shortname, days = parse_stats_args(sys.argv[2:])
+            core.load_config()
+            sys.exit(print_stats(shortname, days))
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            sys.exit(2)
+    elif len(sys.argv) > 1 and sys.argv[1] in ('--batch', '--jobs'):
+        try:
+            source, jobs, shortname = parse_batch_args(sys.argv[1:])
+            if source is None:
+                raise ValueError(BATCH_USAGE)
+            core.load_config()
+            if source == '-':
+                sys.exit(run_batch(sys.stdin, jobs, shortname))
+            with open(source, 'r', encoding='utf-8') as f:
+                sys.exit(run_batch(f, jobs, shortname))
+        except (ValueError, OSError) as e:
+            print(f"[ERROR] {e}")
+            sys.exit(2)
+    elif len(sys.argv) > 1:
         shortname = sys.argv[1]
         args = sys.argv[2:]
         try:
-            command = build_command(shortname, args)
-            # CLI mode uses subprocess.run, which inherits terminal (with colors)
-            subprocess.run(command)
+            core.load_config()
+            # CLI mode inherits the terminal (with colors)
+            run_local(shortname, args)
         except KeyboardInterrupt:
             # User pressed Ctrl+C. We can exit gracefully without an error message.
             # The newline character \n is to ensure the message appears on a new line after the ^C.
@@ -1,25 +1,23 @@
 import os
-import tkinter as tk
-from tkinter import simpledialog, messagebox, scrolledtext, filedialog
-import tkinter.ttk as ttk
-from tkinter import PhotoImage
-from tkinter.ttk import Progressbar
-import tkinter.font as tkFont
 import subprocess
 import threading
 import json
 import signal
-import configparser
 import sys
 import shlex
 import re
 import time
 import queue
-import webbrowser
-from rich.console import Console
-from rich.text import Text
+import collections
+import bisect
+import arGUIments_core as core
+from arGUIments_core import (file_stamp, replace_file, load_profiles, open_profiles,
+                             build_command, process_group_args, wait_process, format_usage,
+                             start_program, format_command, is_chain, is_chain_command)
+# tkinter and the other GUI-only modules are imported in GUI MODE at the
+# bottom, so that running a profile from the command line doesn't load them
 
-console_stream = Console(force_terminal=True)
+STARTUP_TIME = time.perf_counter()
 
 
 def get_base_path():
@@ -44,11 +42,21 @@ else:
 # SETTINGS_FILE = "settings.ini"
 
 
-PROFILE_FILE = os.path.join(BASE_DIR_SETTINGS, "profiles.json")
-SETTINGS_FILE = os.path.join(BASE_DIR_SETTINGS, "settings.ini")
+core.set_config_dir(BASE_DIR_SETTINGS)
+PROFILE_FILE = core.PROFILE_FILE
+SETTINGS_FILE = core.SETTINGS_FILE
+JOBS_FILE = os.path.join(BASE_DIR_SETTINGS, "jobs.db")
 
 
-yt_process = None
+# Default time a stopped job gets after Ctrl+C (SIGINT), then after SIGTERM,
+# before the next signal; overridable in settings.ini
+STOP_INTERRUPT_SECONDS = float(core.DEFAULT_SETTINGS['stop_interrupt_seconds'])
+STOP_TERMINATE_SECONDS = float(core.DEFAULT_SETTINGS['stop_terminate_seconds'])
+STOP_CHECK_MS = 100
+
+# Time from the start of the script to the first paint of the main window
+# that --startup-profile reports as a regression
+STARTUP_BUDGET_MS = 300
 
 class Tooltip:
     instances = []
@@ -115,340 +123,685 @@ class Tooltip:
 
 
 # ============ SETTINGS =============
-def load_settings():
+def load_settings(create=True):
     global showtipsvalue
-    # config = configparser.ConfigParser()
-    config = configparser.ConfigParser(interpolation=None)
-    if not os.path.exists(SETTINGS_FILE):
-        config['DEFAULT'] = {
-            'software_path': 'yt-dlp',
-            'output_flag': '--output',
-            'output_folder': '',
-            'filename_template': '%(title)s.%(ext)s',
-            'show_hints': 'True'
-        }
-        with open(SETTINGS_FILE, 'w') as f:
-            config.write(f)
-    else:
-        config.read(SETTINGS_FILE)
+    config = core.load_settings(create)
     showtipsvalue = config['DEFAULT'].getboolean('show_hints', '')
     return config
 
 def save_settings(config):
     global showtipsvalue
+    if config_changed(SETTINGS_FILE):
+        try:
+            merge_settings(config)  # don't overwrite an edit made by another tool
+        except (OSError, ValueError):
+            pass  # unreadable right now, ours wins
     showtipsvalue = config['DEFAULT'].getboolean('show_hints', '')
-    with open(SETTINGS_FILE, 'w') as f:
-        config.write(f)
-    
-
-settings = load_settings()
+    replace_file(SETTINGS_FILE, config.write)
+    mark_synced(SETTINGS_FILE)
 
 # ============ PROFILES =============
-def load_profiles():
-    if os.path.exists(PROFILE_FILE):
-        with open(PROFILE_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
 def save_profiles(profiles):
-    with open(PROFILE_FILE, 'w') as f:
-        json.dump(profiles, f, indent=2)
-
-profiles = load_profiles()
+    if not isinstance(profiles, dict):
+        return  # SQLite store: every change is already written
+    if config_changed(PROFILE_FILE):
+        try:
+            merge_profiles(profiles)  # don't overwrite an edit made by another tool
+        except (OSError, ValueError):
+            pass  # unreadable right now, ours wins
+    replace_file(PROFILE_FILE, lambda f: json.dump(profiles, f, indent=2))
+    mark_synced(PROFILE_FILE)
+
+def profile_rows(profiles):
+    # (shortname, display_name, command_template) in list order
+    if isinstance(profiles, dict):
+        return [(short, profile["display_name"], profile.get("command_template", ""))
+                for short, profile in profiles.items()]
+    return profiles.rows()
+
+# ============ HOT RELOAD ============
+# Other tools may edit profiles.json and settings.ini while the GUI is open.
+# watch_config_files checks their mtime and size every CONFIG_WATCH_MS and
+# merges what changed into the running GUI (only the changed profiles are
+# re-indexed). Saving merges too: the changes made in the GUI since the last
+# sync are applied on top of what is on disk, so an external edit made in
+# between isn't lost.
+CONFIG_WATCH_MS = 1000
+
+config_stamps = {}      # path -> stamp of the version last read or written
+synced_profiles = {}    # profiles as of the last sync (values compared with ==)
+synced_settings = {}    # [DEFAULT] as of the last sync
+
+def mark_synced(path, stamp=None):
+    global synced_profiles, synced_settings
+    config_stamps[path] = stamp or file_stamp(path)
+    if path == PROFILE_FILE:
+        synced_profiles = dict(profiles)
+    else:
+        synced_settings = dict(settings['DEFAULT'])
+
+def config_changed(path):
+    # Changed on disk since the last sync. A missing file is left alone
+    stamp = file_stamp(path)
+    return path in config_stamps and stamp is not None and stamp != config_stamps[path]
+
+def three_way_merge(synced, ours, theirs):
+    # theirs, plus what was added, edited or deleted on our side since the sync
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if key not in synced or synced[key] != value:
+            merged[key] = value
+    for key in synced.keys() - ours.keys():
+        merged.pop(key, None)
+    return merged
+
+def merge_profiles(profiles):
+    merged = three_way_merge(synced_profiles, profiles, load_profiles())
+    for short in [short for short in profiles if short not in merged]:
+        del profiles[short]
+    for short, profile in merged.items():
+        if profiles.get(short) != profile:
+            profiles[short] = profile
+    if list(profiles) != list(merged):
+        profiles.clear()  # order changed on disk
+        profiles.update(merged)
+    refresh_profiles()
 
-# ============ COMMAND RUNNER ============
-def build_command(shortname, user_args):
-      
-    profile = profiles.get(shortname)
-    if not profile:
-        raise ValueError("Profile not found.")
+def merge_settings(config):
+    global showtipsvalue
+    merged = three_way_merge(synced_settings, dict(config['DEFAULT']),
+                             dict(load_settings(create=False)['DEFAULT']))
+    config['DEFAULT'] = merged
+    showtipsvalue = config['DEFAULT'].getboolean('show_hints', '')
+    Tooltip.refresh_all()
 
-    command_template = profile['command_template']
+def watch_config_files():
     try:
-        args = shlex.split(command_template.format(*user_args))
-    except IndexError as e:
-        raise ValueError(f"Missing arguments: {e}")
+        if isinstance(profiles, dict):
+            if config_changed(PROFILE_FILE):
+                stamp = file_stamp(PROFILE_FILE)  # before reading, so a later write isn't missed
+                merge_profiles(profiles)
+                mark_synced(PROFILE_FILE, stamp)
+        elif profiles.changed_elsewhere():
+            refresh_profiles()
+        if config_changed(SETTINGS_FILE):
+            stamp = file_stamp(SETTINGS_FILE)
+            merge_settings(settings)
+            mark_synced(SETTINGS_FILE, stamp)
+    except (OSError, ValueError):
+        pass  # caught in the middle of a write, try again next time
+    root.after(CONFIG_WATCH_MS, watch_config_files)
 
-    path_mode = profile.get("path_mode", "default")
-    
-    if path_mode == "default":
-        software_path = settings['DEFAULT'].get('software_path')
-    elif path_mode == "custom":
-        software_path = profile.get("program_path")
-    
-    if not software_path:
-        raise ValueError("Software path is not defined in settings or in profile.")
-    
-    command = [software_path] + args
+def center_window(win, width=400, height=300):
+    win.update_idletasks()
+    x = root.winfo_x() + (root.winfo_width() - width) // 2
+    y = root.winfo_y() + (root.winfo_height() - height) // 2
+    win.geometry(f"{width}x{height}+{x}+{y}")
 
+# ============ STOPPING JOBS ============
+# Stopping a job never waits on the UI thread. On Unix the job's process
+# group gets SIGINT (like Ctrl+C), then SIGTERM if it is still there after
+# stop_interrupt_seconds, then SIGKILL after stop_terminate_seconds; a check
+# every STOP_CHECK_MS moves on to the next signal, and tells the console
+# once the whole group (the program and whatever it started) is gone.
+# Clicking Stop again skips to the next signal right away. Windows has no
+# signals for a program without a console: taskkill ends the whole tree.
+STOP_SIGNALS = [('SIGINT', "Interruption signal sent (Ctrl+C)", 'stop_interrupt_seconds', STOP_INTERRUPT_SECONDS),
+                ('SIGTERM', "Process did not stop. Termination signal sent (SIGTERM)", 'stop_terminate_seconds', STOP_TERMINATE_SECONDS),
+                ('SIGKILL', "Process did not respond. Forcing termination (SIGKILL)", None, None)]
+
+def kill_process(job=None):
+    job = job or selected_job()
+    if job is None:
+        append_console_output("\n[No job selected. Pick the tab of the job to stop]\n")
+        return
+    stop_job(job)
 
-    flag = None
-    exportmode = profile.get("export_output_mode")
-    if exportmode == "default":
-        flag = settings['DEFAULT'].get('output_flag')
-    elif exportmode == "custom":
-        flag = profile.get("custom_output_flag")       
-    
-    folder = None
-    mode = profile.get("export_mode", "default")
-    if mode == "default":
-        folder = settings['DEFAULT'].get('output_folder')
-    elif mode == "software":
-        folder = ''
-    elif mode == "custom":
-        folder = profile.get("custom_output_folder", "")        
-        
-    template = None
-    template_name = profile.get("filename_mode")
-    if template_name == "default":
-        template = settings['DEFAULT'].get('filename_template')
-    elif template_name == "custom":
-        template = profile.get("custom_filename_template")       
-        
-        
-    if exportmode != "disable":
-        if folder == "":
-            command += [flag, f"{template}"]
-        else:
-            command += [flag, f"{folder}/{template}"]
-        
-    return command
-
-
-def kill_process():
-    global yt_process
-    progressvar.set(100)
-    progress.stop()
-    # --- DEBUGGING START ---
-    append_console_output("\n[Stop Button Clicked]\n")
-    if yt_process:
-        poll_result = yt_process.poll()
-        append_console_output(f"[DEBUG] kill_process check. Process object: {yt_process}\n")
-        append_console_output(f"[DEBUG] PID: {yt_process.pid}. Poll result: {poll_result}\n")
-        if poll_result is not None:
-            append_console_output(f"[DEBUG] Conclusion: Process has already terminated with code: {poll_result}.\n")
-    # else:
-        # append_console_output("[DEBUG] Conclusion: Global 'yt_process' variable is None.\n")
-    # --- DEBUGGING END ---
+def stop_all_jobs():
+    for job in list(job_manager.jobs.values()):
+        if job.state in ('queued', 'running'):
+            stop_job(job)
 
-    if not yt_process or yt_process.poll() is not None:
-        append_console_output("\n[No active process to stop]\n")
+def stop_job(job):
+    if job.state == 'queued':
+        job_manager.cancel(job)
         return
 
-    append_console_output("\n[Attempting to stop the process...]\n")
-    
-    try:
-        if os.name == 'nt':
-            subprocess.run(
-                ['taskkill', '/F', '/T', '/PID', str(yt_process.pid)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            append_console_output("[Process terminated by user]\n")
-        else:
-            pgid = os.getpgid(yt_process.pid)
-            os.killpg(pgid, signal.SIGINT)
-            append_console_output("[Interruption signal sent (Ctrl+C)]\n")
-            try:
-                yt_process.wait(timeout=5)
-                append_console_output("[Process terminated gracefully]\n")
-            except subprocess.TimeoutExpired:
-                append_console_output("[Process did not respond. Forcing termination...]\n")
-                os.killpg(pgid, signal.SIGKILL)
-                append_console_output("[Process forcefully terminated]\n")
-
-    except Exception as e:
-        append_console_output(f"[ERROR] Failed to stop process: {e}\n")
-    finally:
-        yt_process = None
+    job.console.write("\n[Stop Button Clicked]\n")
+    if job.process is None and job.state == 'running':
+        # Started, but the program isn't yet: job_started stops it
+        job.stop_requested = True
+        job.console.write("\n[The process is starting, it will be stopped right away]\n")
+        return
+    # Only returncode is looked at: Job.run's wait_process reaps the program
+    if not job.process or (job.process.returncode is not None and job.stop_step is None):
+        job.console.write("\n[No active process to stop]\n")
+        return
 
-def center_window(win, width=400, height=300):
-    win.update_idletasks()
-    x = root.winfo_x() + (root.winfo_width() - width) // 2
-    y = root.winfo_y() + (root.winfo_height() - height) // 2
-    win.geometry(f"{width}x{height}+{x}+{y}")
+    job.stopped = True
+    if os.name == 'nt':
+        # In a thread: taskkill takes a moment on a large tree
+        job.console.write("\n[Attempting to stop the process...]\n")
+        threading.Thread(target=taskkill_job, args=(job,), daemon=True).start()
+        return
+    if job.stop_step is None:
+        job.console.write("\n[Attempting to stop the process...]\n")
+        job.stop_step = 0
+        send_stop_signal(job)
+    elif job.stop_step < len(STOP_SIGNALS) - 1:
+        job.stop_step += 1
+        send_stop_signal(job)
+
+def taskkill_job(job):
+    # Worker thread. taskkill ends the tree of the program (or of each
+    # stage of a chain).
+    core.kill_process_group(job.process)
+    job.console.write("[Process terminated by user]\n")
+
+def send_stop_signal(job):
+    name, message, key, default = STOP_SIGNALS[job.stop_step]
+    try:
+        # start_new_session made the program the leader of its own group.
+        # Its pid stays the group's id, and isn't given to another process,
+        # as long as anything is left in the group, reaped leader or not.
+        os.killpg(job.process.pid, getattr(signal, name))
+    except ProcessLookupError:
+        stop_finished(job)
+        return
+    except OSError as e:
+        job.console.write(f"[ERROR] Failed to stop process: {e}\n", "error")
+        job.stop_step = None
+        return
+    job.console.write(f"[{message}]\n")
+    job.stop_deadline = None
+    if key is not None:
+        try:
+            seconds = settings['DEFAULT'].getfloat(key, default)
+        except ValueError:  # not a number in settings.ini
+            seconds = default
+        job.stop_deadline = time.monotonic() + seconds
+    if job.stop_check is None:
+        job.stop_check = root.after(STOP_CHECK_MS, check_stopped, job)
+
+def check_stopped(job):
+    job.stop_check = None
+    if job.stop_step is None:
+        return
+    try:
+        os.killpg(job.process.pid, 0)  # signal 0: is anyone left in the group?
+    except ProcessLookupError:
+        stop_finished(job)
+        return
+    except PermissionError:
+        pass  # a member we may not signal, still there
+    if job.stop_deadline is not None and time.monotonic() >= job.stop_deadline:
+        job.stop_step += 1
+        send_stop_signal(job)
+    if job.stop_step is not None and job.stop_check is None:
+        job.stop_check = root.after(STOP_CHECK_MS, check_stopped, job)
+
+def stop_finished(job):
+    if STOP_SIGNALS[job.stop_step][0] == 'SIGKILL':
+        job.console.write("[Process forcefully terminated]\n")
+    else:
+        job.console.write("[Process terminated gracefully]\n")
+    job.stop_step = None
 
 # --- NEW FUNCTION ---
-# This function sends user input to the running process.
+# This function sends user input to the process of the selected job.
 def send_to_process(event=None):
-    global yt_process
     # Get text from the input entry and clear it
     input_text = console_input_entry.get()
     console_input_entry.delete(0, tk.END)
 
-    # Echo the input to the console display with a special tag
-    append_console_output(f"{input_text}\n", "user_input")
+    job = selected_job()
+    if job is None:
+        append_console_output(f"{input_text}\n", "user_input")
+        append_console_output("\n[No job selected to send input to]\n")
+        return
+
+    # Echo the input to the job's console with a special tag
+    job.console.write(f"{input_text}\n", "user_input")
 
-    # If a process is running, write the input to its stdin
-    if yt_process and yt_process.poll() is None:
+    # If the process is running, write the input to its stdin
+    process = job.process
+    if process and process.returncode is None:
         try:
             # Add a newline character and flush immediately
-            yt_process.stdin.write(f"{input_text}\n")
-            yt_process.stdin.flush()
-            append_console_output("[Input sent to process]\n")
+            process.stdin.write(f"{input_text}\n".encode('utf-8'))
+            process.stdin.flush()
+            job.console.write("[Input sent to process]\n")
         except (IOError, BrokenPipeError, OSError) as e:
-            append_console_output(f"\n[ERROR] Failed to send input to process: {e}\n")
+            job.console.write(f"\n[ERROR] Failed to send input to process: {e}\n", "error")
             # Try to check if process is still alive
-            if yt_process and yt_process.poll() is not None:
-                append_console_output(f"[Process has already exited with code: {yt_process.poll()}]\n")
+            if process.returncode is not None:
+                job.console.write(f"[Process has already exited with code: {process.returncode}]\n")
     else:
-        if yt_process:
-            rc = yt_process.poll()
-            append_console_output(f"\n[Process has exited with code: {rc}]\n")
+        if process:
+            rc = process.returncode
+            job.console.write(f"\n[Process has exited with code: {rc}]\n")
+        else:
+            job.console.write("\n[No active process to send input to]\n")
+
+def run_command(command, show_output_in_gui=True, profile=None, args=None):
+    return job_manager.submit(command, profile, args=args)
+
+
+# ============ JOBS ============
+# Every run is a Job with its own console tab, stdin and stop button. The
+# JobManager starts queued jobs while fewer than max_concurrent_jobs are
+# running. Its state is only changed on the UI thread: the process runner's
+# loop (or a job's worker thread on Windows) reports back through run_on_ui.
+class Job:
+    def __init__(self, job_id, command, profile=None, args=None):
+        self.id = job_id
+        self.command = command
+        self.profile = profile
+        self.args = args        # the arguments asked for, when known (not for resumed jobs)
+        self.name = (profile or {}).get('shortname') or os.path.basename(
+            command[0][0] if is_chain_command(command) else command[0])
+        self.state = 'queued'   # queued, running, finished, cancelled
+        self.process = None
+        self.returncode = None
+        self.usage = None       # resource usage from wait_process, where there is wait4
+        self.stopped = False    # stopped by the user
+        self.stop_requested = False  # Stop clicked before the program was started
+        self.stop_step = None   # index in STOP_SIGNALS while being stopped
+        self.stop_deadline = None
+        self.stop_check = None  # pending root.after of check_stopped
+        self.samples = []       # throughput time series for this run
+        self.percent = None     # last known progress, for the progress bar
+        self.resumed = False    # restarted after the GUI was closed mid-run
+        self.log = None         # RunLog of this run's output, if log_runs is on
+        self.started_at = None  # wall clock time, for the run history
+        self.output_bytes = {'stdout': 0, 'stderr': 0}
+        self.tab = None
+        self.console = None
+
+    def title(self):
+        title = f"{self.name} #{self.id}"
+        if self.state == 'finished':
+            if self.stopped:
+                return f"{title} (stopped)"
+            return f"{title} ({'failed' if self.returncode is None else self.returncode})"
+        if self.state != 'running':
+            return f"{title} ({self.state})"
+        return title
+
+    def start(self):
+        self.state = 'running'
+        self.started_at = time.time()
+        if core.RUNNER_SUPPORTED:
+            core.process_runner.call(self.launch)
         else:
-            append_console_output("\n[No active process to send input to]\n")
+            threading.Thread(target=self.run, daemon=True).start()
 
-def run_command(command, show_output_in_gui=True):
-    global yt_process
-    
-    def task():
-        global yt_process  # Add this line to ensure we're modifying the global variable
-        nonlocal command
-        # Clear console and start progress bar
-        console_output.configure(state='normal')
-        console_output.delete("1.0", tk.END)
-        console_output.configure(state='disabled')
-        progressvar.set(0)
-        progress.start()
-        append_console_output(f"[DEBUG] Running command: {' '.join(shlex.quote(c) for c in command)}\n")
+    def spawn(self):
+        # Starts the program, on the runner's loop or the job's thread (never
+        # the UI thread, and never touching Tk). Returns it with the output
+        # handler of each stream, or None if it could not start.
+        command = self.command
+        self.console.write(f"[DEBUG] Running command: {format_command(command)}\n")
 
         try:
-            # Common Popen arguments
+            # The handlers first, so that a bad progress_regex fails before
+            # anything runs
+            started = time.monotonic()
+            handlers = {name: self.output_handler(name, started) for name in ('stdout', 'stderr')}
+
+            # Common Popen arguments. Pipes are left in binary, unbuffered mode:
+            # the output handlers get large chunks straight from the fd.
+            # The program gets its own process group (see process_group_args),
+            # and the nice level, cores and limits its profile asks for. A
+            # chain's stages share the group, and their stderr.
             popen_args = {
                 "stdin": subprocess.PIPE,
                 "stdout": subprocess.PIPE,
                 "stderr": subprocess.PIPE,  # Separate stderr
-                "text": True,
-                "encoding": 'utf-8',
-                "errors": 'replace',
-                "bufsize": 1,
+                "bufsize": 0,
             }
-
-            # if os.name == 'nt':
-                # # Windows-specific settings
-                # popen_args['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
-            # else:
-                # # Unix-specific settings
-                # popen_args['preexec_fn'] = os.setsid
-
-            if os.name == 'nt':
-                # Windows-specific settings:
-                # CREATE_NEW_PROCESS_GROUP is for sending Ctrl+C/signals.
-                # CREATE_NO_WINDOW prevents a new console from popping up for the subprocess.
-                popen_args['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW
-            else:
-                # Unix-specific settings
-                popen_args['preexec_fn'] = os.setsid
+            popen_args.update(process_group_args())
                 
-            yt_process = subprocess.Popen(command, **popen_args)
-            append_console_output(f"\n[DEBUG] Process started. PID: {yt_process.pid}\n\n")
+            process = start_program(self.profile, command, popen_args)
+        except Exception as e:
+            self.console.write(f"[ERROR] Failed to start process: {e}\n", "error")
+            run_on_ui(job_manager.job_finished, self)
+            return None
 
+        self.process = process
+        run_on_ui(job_manager.job_started, self)
+        try:
+            self.log = core.open_run_log(settings, self.name, self.id, command)
         except Exception as e:
-            append_console_output(f"[ERROR] Failed to start process: {e}\n")
-            yt_process = None
+            self.abort(e)
+            return None
+        if self.log:
+            self.console.write(f"[DEBUG] Logging output to {self.log.path}\n")
+        self.console.write(f"\n[DEBUG] Process started. PID: {process.pid}\n\n")
+        return process, handlers
+
+    def abort(self, error):
+        # Something failed once the program was running: it is killed and
+        # reaped, and the job finishes like any other
+        self.console.write(f"[ERROR] {error}\n", "error")
+        core.kill_process_group(self.process)
+        self.finish(wait_process(self.process))
+
+    def output_handler(self, stream_name, started):
+        # Returns the function each chunk of one stream goes through (b'' at
+        # its end). Whatever the pipe had is forwarded right away, so partial
+        # lines such as interactive prompts show up without any keyword
+        # guessing. Colours are parsed here too, each stream keeping its own
+        # state, and the console queues the result for the UI pump. Raises
+        # re.error for an invalid progress_regex.
+        decoder = core.text_decoder()
+        parser = AnsiParser()
+        # The profile's own command: ionice may wrap the one that was started
+        extractor = create_progress_extractor(self.profile, self.command, started)
+        last_update = 0
+        failed = False
+
+        def feed(data):
+            nonlocal last_update, failed
+            self.output_bytes[stream_name] += len(data)
+            if self.log and data:
+                self.log.write(data)
+            if failed:
+                return
+            try:
+                text = decoder.decode(data, final=not data)
+                if not text:
+                    return
+                segments = parser.feed(text)
+                self.console.write_segments(segments)
+                if extractor:
+                    new_samples = extractor.feed(progress_text(segments))
+                    if new_samples:
+                        self.samples.extend(new_samples)
+                        if time.monotonic() - last_update >= PROGRESS_UPDATE_INTERVAL:
+                            last_update = time.monotonic()
+                            run_on_ui(show_progress_sample, self, new_samples[-1])
+            except Exception as e:
+                failed = True
+                self.console.write(f"Error reading {stream_name}: {e}\n", "error")
+
+        return feed
+
+    def launch(self):
+        # On the process runner's loop, which watches the pipes and the exit
+        # of every job. Reading pauses while the console is behind, so a
+        # program writing faster than Tk renders waits on its pipe instead
+        # of growing our memory.
+        spawned = self.spawn()
+        if spawned is None:
             return
+        process, handlers = spawned
+        try:
+            core.process_runner.watch(process, lambda name, data: handlers[name](data), self.finish,
+                                      ready=lambda: not self.console.full())
+        except Exception as e:
+            self.abort(e)
 
-        # Read output using threading for both stdout and stderr
+    def run(self):
+        # Worker thread, where the process runner can't watch pipes (Windows):
+        # one reader thread per stream
+        spawned = self.spawn()
+        if spawned is None:
+            return
+        process, handlers = spawned
+        usage = None
         try:
-            import queue
-            import threading
-            
-            output_queue = queue.Queue()
-            
             def read_stream(stream, stream_name):
+                feed = handlers[stream_name]
+                fd = stream.fileno()
                 try:
-                    buffer = ""
                     while True:
-                        char = stream.read(1)
-                        if not char:  # End of stream
-                            if buffer:
-                                output_queue.put((stream_name, buffer))
+                        self.console.wait_for_space()
+                        data = os.read(fd, core.READ_CHUNK_SIZE)
+                        feed(data)
+                        if not data:  # End of stream
                             break
-                        
-                        buffer += char
-                        
-                        # Send output immediately if:
-                        # 1. We hit a newline (complete line)
-                        # 2. We hit a prompt indicator (: or >) 
-                        # 3. Buffer gets too long (safety)
-                        # 4. We hit a space after certain prompt words
-                        if (char == '\n' or 
-                            char in ':>' or 
-                            len(buffer) > 100 or
-                            (char == ' ' and any(word in buffer.lower() for word in ['continue', 'name', 'input', 'enter', 'press', 'choose', 'select']))):
-                            output_queue.put((stream_name, buffer))
-                            buffer = ""
-                            
-                except Exception as e:
-                    if buffer:
-                        output_queue.put((stream_name, buffer))
-                    output_queue.put(('error', f"Error reading {stream_name}: {e}\n"))
+                except OSError as e:
+                    self.console.write(f"Error reading {stream_name}: {e}\n", "error")
             
             # Start threads for reading stdout and stderr
-            stdout_thread = threading.Thread(target=read_stream, args=(yt_process.stdout, 'stdout'), daemon=True)
-            stderr_thread = threading.Thread(target=read_stream, args=(yt_process.stderr, 'stderr'), daemon=True)
+            stdout_thread = threading.Thread(target=read_stream, args=(process.stdout, 'stdout'), daemon=True)
+            stderr_thread = threading.Thread(target=read_stream, args=(process.stderr, 'stderr'), daemon=True)
             
             stdout_thread.start()
             stderr_thread.start()
             
-            # Process output from both streams
-            while yt_process and yt_process.poll() is None:
-                try:
-                    stream_name, line = output_queue.get(timeout=0.1)
-                    append_console_output(line)
-                except queue.Empty:
-                    continue
-                except Exception as e:
-                    append_console_output(f"[ERROR] Queue error: {e}\n")
-                    break
+            usage = wait_process(process)
             
-            # Read any remaining output after process ends
-            timeout_count = 0
-            while timeout_count < 10:  # Give it 1 second to finish
-                try:
-                    stream_name, line = output_queue.get(timeout=0.1)
-                    append_console_output(line)
-                    timeout_count = 0  # Reset if we got data
-                except queue.Empty:
-                    timeout_count += 1
-                    continue
-                except Exception:
-                    break
+            # Give the readers a second to drain what is left in the pipes. A
+            # grandchild that inherited them may keep them open for longer.
+            stdout_thread.join(timeout=1)
+            stderr_thread.join(timeout=1)
 
         except Exception as e:
-            append_console_output(f"[ERROR] Error reading process output: {e}\n")
+            self.console.write(f"[ERROR] Error reading process output: {e}\n", "error")
 
         finally:
-            progressvar.set(100)
-            progress.stop()
-            append_console_output(f"\n[DEBUG] Process finished reading output.\n")
-
-            if yt_process:
-                # Wait a moment for the process to finish naturally
+            # Wait a moment for the process to finish naturally
+            if process.returncode is None:
                 try:
-                    yt_process.wait(timeout=2)
+                    process.wait(timeout=2)
                 except subprocess.TimeoutExpired:
                     pass
-                    
-                rc = yt_process.poll()
-                if rc is not None:
-                    append_console_output(f"\n[Process exited with code: {rc}]\n")
-                else:
-                     append_console_output(f"\n[Process completed]\n")
-                     
-                # Close stdin properly
-                try:
-                    if yt_process.stdin:
-                        yt_process.stdin.close()
-                except:
-                    pass
+            self.finish(usage)
+
+    def finish(self, usage):
+        # The program exited and its output was read
+        process = self.process
+        self.usage = usage
+        self.console.write(f"\n[DEBUG] Process finished reading output.\n")
+        summary = summarize_throughput(self.samples)
+        if summary:
+            self.console.write(summary, "info")
+
+        self.returncode = process.returncode
+        if isinstance(process, core.ProcessChain):
+            self.console.write(f"\n[Stages: {process.status()}]")
+        if self.returncode is not None:
+            self.console.write(f"\n[Process exited with code: {self.returncode}]\n")
+        else:
+             self.console.write(f"\n[Process completed]\n")
+        usage = format_usage(self.usage, self.started_at and time.time() - self.started_at)
+        if usage:
+            self.console.write(f"[Resources] {usage}\n", "info")
+        if self.log:
+            self.log.close(self.returncode)
+             
+        # Close stdin properly
+        try:
+            if process.stdin:
+                process.stdin.close()
+        except:
+            pass
+        run_on_ui(job_manager.job_finished, self)
+
+
+class JobJournal:
+    # On-disk record of queued and running jobs (jobs.db, next to
+    # profiles.json), so they survive the GUI being closed or the machine
+    # restarting. Every state change is committed right away; WAL keeps
+    # those small commits cheap and a crash mid-write leaves the last
+    # committed state intact. Only used from the UI thread.
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            command TEXT NOT NULL,
+            profile TEXT,
+            state TEXT NOT NULL,
+            pid INTEGER,
+            created REAL,
+            started REAL,
+            finished REAL,
+            returncode INTEGER)""")
+        # Added later: journals from before have no process_identity column
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        if 'process_identity' not in existing:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN process_identity TEXT")
+        # Finished jobs are only kept until the next start
+        self.db.execute("DELETE FROM jobs WHERE state NOT IN ('queued', 'running')")
+        self.db.commit()
+
+    def next_id(self):
+        return (self.db.execute("SELECT MAX(id) FROM jobs").fetchone()[0] or 0) + 1
+
+    def add(self, job):
+        with self.db:
+            self.db.execute("INSERT INTO jobs (id, command, profile, state, created) VALUES (?, ?, ?, ?, ?)",
+                            (job.id, json.dumps(job.command), json.dumps(job.profile), job.state, time.time()))
+
+    def update(self, job, state=None, **fields):
+        self.set(job.id, state=state or job.state, **fields)
+
+    def set(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self.db:
+            self.db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def unfinished(self):
+        return self.db.execute(
+            "SELECT id, command, profile, state, pid, process_identity FROM jobs "
+            "WHERE state IN ('queued', 'running') ORDER BY id"
+        ).fetchall()
+
+
+def process_identity(pid):
+    # What tells this process apart from a later one given the same pid
+    # (after a reboot or once pids wrapped around): the boot id and the
+    # start time in /proc/<pid>/stat. None where there is no /proc.
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            boot_id = f.read().strip()
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The name in parentheses may contain spaces: fields are counted from
+    # the last ')', which is followed by field 3 (state). Field 22 is starttime.
+    return f"{boot_id}:{stat[stat.rindex(')') + 2:].split()[19]}"
+
+def process_alive(pid, identity=None):
+    # identity: what process_identity returned when the job started, if anything
+    if not pid:
+        return False
+    if identity and process_identity(pid) != identity:
+        return False
+    try:
+        if os.name == 'nt':
+            output = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/NH'], capture_output=True,
+                                    text=True, creationflags=subprocess.CREATE_NO_WINDOW).stdout
+            return str(pid) in output
+        os.kill(pid, 0)
+        return True
+    except PermissionError:
+        return True     # alive, but owned by someone else
+    except OSError:
+        return False
+
+
+class JobManager:
+    def __init__(self, journal=None):
+        self.jobs = {}                       # id -> Job, in submission order
+        self.pending = collections.deque()   # queued jobs, oldest first
+        self.journal = journal
+        self.next_id = journal.next_id() if journal else 1
+
+    def max_jobs(self):
+        # Read on every start: settings.ini edits apply right away, and a
+        # value that isn't a number means the default
+        return max(1, core.get_int_setting(settings, 'max_concurrent_jobs'))
+
+    def running(self):
+        return [job for job in self.jobs.values() if job.state == 'running']
+
+    def submit(self, command, profile=None, job_id=None, journal=True, args=None):
+        job = Job(job_id or self.next_id, command, profile, args)
+        self.next_id = max(self.next_id, job.id + 1)
+        self.jobs[job.id] = job
+        if self.journal and journal:
+            self.journal.add(job)
+        open_job_tab(job)
+        self.pending.append(job)
+        self.start_pending()
+        if job.state == 'queued':
+            job.console.write(f"[Queued: {len(self.running())} jobs already running]\n")
+        return job
+
+    def restore(self):
+        # Bring back what was queued or running when the GUI last exited.
+        # Interrupted runs get the profile's "resume_args" (e.g. --continue)
+        # so the tool picks up where it stopped instead of starting over.
+        for job_id, command, profile, state, pid, identity in self.journal.unfinished():
+            command = json.loads(command)
+            profile = json.loads(profile) if profile else None
+            if state == 'running' and process_alive(pid, identity):
+                append_console_output(f"[Job #{job_id} is still running from the previous session (PID {pid}), it was not resumed]\n", "warning")
+                self.journal.set(job_id, state='detached')
+                continue
+            if state == 'running':
+                resume_args = (profile or {}).get('resume_args', '')
+                if resume_args and not is_chain_command(command):
+                    command = command + shlex.split(resume_args)
+                self.journal.set(job_id, command=json.dumps(command), state='queued')
+            job = self.submit(command, profile, job_id=job_id, journal=False)
+            job.resumed = state == 'running'
+            append_console_output(f"[Job #{job_id} {'resumed' if job.resumed else 're-queued'} from the previous session]\n")
+
+    def start_pending(self):
+        while self.pending and len(self.running()) < self.max_jobs():
+            job = self.pending.popleft()
+            job.start()
+            if self.journal:
+                self.journal.update(job, started=time.time())
+            update_job_tab(job)
+
+    def job_started(self, job):
+        if self.journal and job.process:
+            self.journal.update(job, pid=job.process.pid, process_identity=process_identity(job.process.pid))
+        if job.stop_requested:
+            job.stop_requested = False
+            stop_job(job)
+
+    def job_finished(self, job):
+        job.state = 'finished'
+        if self.journal:
+            self.journal.update(job, state='stopped' if job.stopped else 'finished',
+                                finished=time.time(), returncode=job.returncode)
+        # On the log writer's thread: a locked history.db (the console
+        # daemon writing too) must not freeze the window
+        core.log_writer.call(record_job, job, time.time())
+        update_job_tab(job)
+        self.start_pending()
+
+    def cancel(self, job):
+        if job.state == 'queued':
+            self.pending.remove(job)
+            job.state = 'cancelled'
+            if self.journal:
+                self.journal.update(job)
+            job.console.write("[Removed from the queue]\n")
+            update_job_tab(job)
+
+    def remove(self, job):
+        self.cancel(job)
+        del self.jobs[job.id]
+
+
+def record_job(job, finished):
+    try:
+        core.record_run(settings, job.name, job.args, job.command, job.started_at or finished, job.returncode,
+                        sum(job.output_bytes.values()), job.stopped, job.usage, finished)
+    except Exception as e:
+        job.console.write(f"[Run not recorded in the history: {e}]\n", "warning")
 
-            # Only set to None after everything is done
-            yt_process = None
 
-    threading.Thread(target=task, daemon=True).start()
-    
 def count_placeholders(template):
     return len(re.findall(r"{[^}]*}", template))
     
@@ -466,6 +819,213 @@ def run_command_threaded(command):
     except Exception as e:
         console_output.insert(tk.END, f"Error: {str(e)}\n")
 
+# ============ PROGRESS ============
+# Progress extractors turn a child's output into samples
+# {'time', 'percent', 'speed', 'eta'} (seconds since start, 0-100, bytes/s,
+# seconds; any of the last three may be None). Which one a profile uses is set
+# by its "progress_parser" field: auto (guessed from the program name), yt-dlp,
+# ffmpeg, custom (with "progress_regex") or none.
+PROGRESS_UPDATE_INTERVAL = 0.1  # seconds between progress bar updates
+PROGRESS_MAX_LINE = 4096        # characters kept of a line with no end yet
+
+SIZE_UNITS = {'': 1, 'k': 1000, 'm': 1000 ** 2, 'g': 1000 ** 3, 't': 1000 ** 4,
+              'ki': 1024, 'mi': 1024 ** 2, 'gi': 1024 ** 3, 'ti': 1024 ** 4}
+SIZE_PATTERN = re.compile(r'([\d.]+)\s*([kmgt]i?)?b', re.IGNORECASE)
+
+def parse_size(text):
+    # "3.10MiB/s" -> 3250585.6, "512kB" -> 512000.0
+    match = SIZE_PATTERN.match(text.strip()) if text else None
+    if not match:
+        return None
+    try:
+        return float(match.group(1)) * SIZE_UNITS[(match.group(2) or '').lower()]
+    except ValueError:
+        return None
+
+def parse_duration(text):
+    # "01:02:03.5", "02:03" or "93" -> seconds
+    if not text:
+        return None
+    try:
+        seconds = 0.0
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def progress_text(segments):
+    # AnsiParser output as the extractors read it: cursor controls (a bar
+    # redrawn with ESC[G, erase-line...) end the line like a \r would
+    return ''.join('\r' if text is None else text for text, _ in segments)
+
+class ProgressExtractor:
+    # Splits the stream on \r and \n and hands complete lines to parse_line.
+    # One instance per stream, so partial lines never mix stdout and stderr.
+    # Of a line that doesn't end (a prompt, or output with no line breaks at
+    # all) only the last PROGRESS_MAX_LINE characters are kept: progress
+    # lines are short, and each chunk is then split once.
+
+    def __init__(self, started):
+        self.started = started
+        self.partial = ''
+
+    def feed(self, text):
+        end = max(text.rfind('\r'), text.rfind('\n'))
+        if end == -1:
+            self.partial = (self.partial + text)[-PROGRESS_MAX_LINE:]
+            return []
+        lines = re.split(r'[\r\n]', self.partial + text[:end])
+        self.partial = text[end + 1:][-PROGRESS_MAX_LINE:]
+        samples = []
+        for line in lines:
+            sample = self.parse_line(line) if line else None
+            if sample:
+                sample['time'] = time.monotonic() - self.started
+                samples.append(sample)
+        return samples
+
+    def parse_line(self, line):
+        return None
+
+
+class RegexProgress(ProgressExtractor):
+    # Named groups "percent", "speed" and "eta" are all optional
+    def __init__(self, started, pattern):
+        super().__init__(started)
+        self.pattern = re.compile(pattern)
+
+    def parse_line(self, line):
+        match = self.pattern.search(line)
+        if not match:
+            return None
+        groups = match.groupdict()
+        try:
+            percent = float(groups['percent']) if groups.get('percent') else None
+        except ValueError:
+            percent = None
+        return {
+            'percent': percent,
+            'speed': parse_size(groups.get('speed')),
+            'eta': parse_duration(groups.get('eta')),
+        }
+
+
+class YtDlpProgress(RegexProgress):
+    # [download]  45.3% of ~ 120.00MiB at  3.10MiB/s ETA 00:31 (frag 3/20)
+    PATTERN = r'^\[download\]\s+(?P<percent>[\d.]+)%(?:.*?\bat\s+(?P<speed>[\d.]+\s*[KMGT]?i?B)/s)?(?:.*?\bETA\s+(?P<eta>[\d:]+))?'
+
+    def __init__(self, started):
+        super().__init__(started, self.PATTERN)
+
+    def parse_line(self, line):
+        if not line.startswith('[download]'):
+            return None
+        return super().parse_line(line)
+
+
+class FfmpegProgress(ProgressExtractor):
+    # "Duration: 00:01:23.45," gives the total, then each
+    # "size=    2048kB time=00:00:10.00 bitrate=... speed=1.5x" gives a sample.
+    DURATION = re.compile(r'Duration:\s*(\d+:\d+:[\d.]+)')
+    SIZE = re.compile(r'size=\s*([\d.]+\s*[kKMG]i?B)')
+    TIME = re.compile(r'time=\s*(-?[\d:.]+)')
+    SPEED = re.compile(r'speed=\s*([\d.]+)x')
+
+    def __init__(self, started):
+        super().__init__(started)
+        self.duration = None
+        self.last_size = None
+
+    def parse_line(self, line):
+        if self.duration is None and 'Duration:' in line:
+            match = self.DURATION.search(line)
+            if match:
+                self.duration = parse_duration(match.group(1))
+            return None
+        if 'time=' not in line:
+            return None
+        match = self.TIME.search(line)
+        if not match:
+            return None
+        position = parse_duration(match.group(1))
+        sample = {'percent': None, 'speed': None, 'eta': None}
+        if self.duration and position is not None and position >= 0:
+            sample['percent'] = min(100.0, position * 100 / self.duration)
+            match = self.SPEED.search(line)
+            realtime = float(match.group(1)) if match else 0
+            if realtime > 0:
+                sample['eta'] = max(0.0, (self.duration - position) / realtime)
+        # ffmpeg's "kB" is KiB; the rate is the output size growth over wall time
+        match = self.SIZE.search(line)
+        size = parse_size(match.group(1).replace('kB', 'KiB')) if match else None
+        now = time.monotonic()
+        if size is not None:
+            if self.last_size and now > self.last_size[1] and size >= self.last_size[0]:
+                sample['speed'] = (size - self.last_size[0]) / (now - self.last_size[1])
+            self.last_size = (size, now)
+        return sample
+
+
+def create_progress_extractor(profile, command, started):
+    mode = (profile or {}).get('progress_parser', 'auto')
+    if mode == 'auto':
+        # The first stage of a chain that has a known progress format
+        for stage in (command if is_chain_command(command) else [command] if command else []):
+            program = os.path.basename(stage[0]).lower()
+            if program.startswith(('yt-dlp', 'youtube-dl')):
+                mode = 'yt-dlp'
+                break
+            elif program.startswith('ffmpeg'):
+                mode = 'ffmpeg'
+                break
+    if mode == 'yt-dlp':
+        return YtDlpProgress(started)
+    if mode == 'ffmpeg':
+        return FfmpegProgress(started)
+    if mode == 'custom' and profile.get('progress_regex'):
+        return RegexProgress(started, profile['progress_regex'])
+    return None
+
+def summarize_throughput(samples):
+    from run_history import format_bytes
+    speeds = [s['speed'] for s in samples if s['speed'] is not None]
+    if not speeds:
+        return None
+    return (f"[Throughput] {len(speeds)} samples over {samples[-1]['time']:.0f}s, "
+            f"average {format_bytes(sum(speeds) / len(speeds))}/s, peak {format_bytes(max(speeds))}/s\n")
+
+progress_animating = False
+
+def show_progress_sample(job, sample):
+    if sample['percent'] is not None:
+        job.percent = sample['percent']
+        if job is selected_job():
+            update_progress_bar()
+
+def update_progress_bar():
+    # The bar follows the job whose tab is selected: its real position once
+    # the job reported a percentage, the running animation until then.
+    global progress_animating
+    job = selected_job()
+    animate = job is not None and job.state == 'running' and job.percent is None
+    if animate and not progress_animating:
+        progressvar.set(0)
+        progress.start()
+    elif not animate and progress_animating:
+        progress.stop()
+    progress_animating = animate
+    if animate:
+        return
+    if job is None or job.state == 'queued':
+        progressvar.set(0)
+    elif job.state == 'running':
+        progressvar.set(int(job.percent))
+    else:
+        progressvar.set(100)
+
+
 # ============ GUI =============
 def add_profile():
     global showtipsvalue
@@ -765,6 +1325,7 @@ def add_profile():
     save_btn.grid(row=1, column=0, pady=10, sticky='w')
     
 def choose_file(entry_field, place):
+    from tkinter import filedialog  # loaded on first use, not at startup
     place.attributes("-topmost", False)
     path = filedialog.askopenfilename()
     place.attributes("-topmost", True)
@@ -773,6 +1334,7 @@ def choose_file(entry_field, place):
         entry_field.insert(0, path)
 
 def choose_folder(entry_widget, place):
+    from tkinter import filedialog
     place.attributes("-topmost", False)
     path = filedialog.askdirectory()
     place.attributes("-topmost", True)
@@ -791,6 +1353,9 @@ def edit_profile():
         return
 
     profile = profiles[short]
+    if is_chain(profile):
+        custom_info_dialog("Info", "Chain profiles are edited in profiles.json.")
+        return
 
     top = tk.Toplevel(root)
     top.grab_set()
@@ -1049,18 +1614,19 @@ def edit_profile():
                 error_label.config(text=f"Template has {arg_count} arguments placeholders, but {len(arg_names)} argument names were provided.")
                 return
 
-            if short_new != original_short:
-                del profiles[original_short]
-    
-
             if export_mode.get() == "custom":
                 if len(custom_export_entry) == 0:
                     error_label.config(text="Custom Output Path cannot be empty.")
                     return                     
                 # custom_output_folder = custom_export_entry
 
+            # Only once everything is valid: with the SQLite store this is written right away
+            if short_new != original_short:
+                del profiles[original_short]
+
             # profiles[short] = {
             profiles[short_new] = {
+                **profile,  # keep fields that are only set in profiles.json
                 "display_name": name,
                 "shortname": short_new,
                 "path_mode": path_mode.get(),
@@ -1131,10 +1697,7 @@ def delete_profile():
         refresh_profiles()
 
 def get_selected_shortname():
-    selected = profile_listbox.curselection()
-    if selected:
-        return profile_keys[selected[0]]
-    return None
+    return profile_list.selected
 
 def custom_input_popup(title, prompt, icon_path="icon.ico"):
     def on_ok():
@@ -1167,8 +1730,10 @@ def on_profile_double_click(event=None):
     profile = profiles[short]
     args = []
     arg_names = profile.get('arg_names', [])
-    template = profile['command_template']
-    arg_count = count_placeholders(template)
+    if is_chain(profile):
+        arg_count = core.chain_arg_count(profile)
+    else:
+        arg_count = count_placeholders(profile['command_template'])
     for i in range(arg_count):
         label = arg_names[i] if i < len(arg_names) else f"Argument {i+1}"
         val = custom_input_popup("Parameter", f"{label}:", icon_path="icon.ico")
@@ -1176,11 +1741,37 @@ def on_profile_double_click(event=None):
         args.append(val)
     try:
         command = build_command(short, args)
-        run_command(command, show_output_in_gui=True)
+        run_command(command, show_output_in_gui=True, profile=profile, args=args)
     except Exception as e:
+        from tkinter import messagebox
         messagebox.showerror("Error", str(e))
 
+# The settings and about windows are built the first time they are opened,
+# then hidden instead of destroyed so they open instantly afterwards.
+def reuse_window(name):
+    top = windows.get(name)
+    if top is None:
+        return False
+    root.focus_set()
+    top.deiconify()
+    top.grab_set()
+    top.refresh()
+    return True
+
+def keep_window(name, top, refresh=lambda: None):
+    def hide():
+        top.grab_release()
+        top.withdraw()
+    top.protocol("WM_DELETE_WINDOW", hide)
+    top.hide = hide
+    top.refresh = refresh
+    windows[name] = top
+
+windows = {}
+
 def open_settings_window():
+    if reuse_window("settings"):
+        return
     root.focus_set()
     top = tk.Toplevel(root)
     top.grab_set()
@@ -1191,25 +1782,22 @@ def open_settings_window():
 
     tk.Label(top, text="Program Path:").grid(row=0, column=0, sticky='w', padx=10, pady=5)
     yt_entry = tk.Entry(top, width=40)
-    yt_entry.insert(0, settings['DEFAULT'].get('software_path', ''))
     yt_entry.grid(row=0, column=1, padx=10, pady=5)
 
     tk.Label(top, text="Output Parameter (optional):").grid(row=1, column=0, sticky='w', padx=10, pady=5)
     param_entry = tk.Entry(top, width=40)
-    param_entry.insert(0, settings['DEFAULT'].get('output_flag', ''))
     param_entry.grid(row=1, column=1, padx=10, pady=5)
     
     tk.Label(top, text="Output Path (optional):").grid(row=2, column=0, sticky='w', padx=10, pady=5)
     folder_entry = tk.Entry(top, width=40)
-    folder_entry.insert(0, settings['DEFAULT'].get('output_folder', ''))
     folder_entry.grid(row=2, column=1, padx=10, pady=5)
 
     tk.Label(top, text="Output Filename Template (optional):").grid(row=3, column=0, sticky='w', padx=10, pady=5)
     filenametemplate_entry = tk.Entry(top, width=40)
-    filenametemplate_entry.insert(0, settings['DEFAULT'].get('filename_template', ''))
     filenametemplate_entry.grid(row=3, column=1, padx=10, pady=5)
     
     def browse_folder():
+        from tkinter import filedialog
         top.attributes("-topmost", False)
         folder = filedialog.askdirectory()
         top.attributes("-topmost", True)
@@ -1219,8 +1807,16 @@ def open_settings_window():
 
     ttk.Button(top, text="Browse", command=browse_folder).grid(row=2, column=2, padx=5)
 
-    show_hints = tk.BooleanVar(value=settings['DEFAULT'].getboolean('show_hints', False))
+    show_hints = tk.BooleanVar()
     tk.Checkbutton(top, text="Show hints on hover", variable=show_hints).grid(row=4, column=1, sticky='w', pady=5)
+
+    def refresh():
+        # Show the current settings every time the window is opened
+        for entry, key in ((yt_entry, 'software_path'), (param_entry, 'output_flag'),
+                           (folder_entry, 'output_folder'), (filenametemplate_entry, 'filename_template')):
+            entry.delete(0, tk.END)
+            entry.insert(0, settings['DEFAULT'].get(key, ''))
+        show_hints.set(settings['DEFAULT'].getboolean('show_hints', False))
     
     def save():
         settings['DEFAULT']['software_path'] = yt_entry.get()
@@ -1230,12 +1826,16 @@ def open_settings_window():
         settings['DEFAULT']['show_hints'] = str(show_hints.get())
         
         save_settings(settings)
-        top.destroy()
+        top.hide()
         Tooltip.refresh_all()
 
     ttk.Button(top, text="Save", command=save).grid(row=5, column=1, sticky='e', pady=10)
+    keep_window("settings", top, refresh)
+    refresh()
 
 def open_about_window():
+    if reuse_window("about"):
+        return
     root.focus_set()
     top = tk.Toplevel(root)
     top.title("About")
@@ -1245,12 +1845,122 @@ def open_about_window():
     top.grab_set()
 
     tk.Label(top, text="arGUIments \nv1.0.0\nCreated with ❤️\nby dayeggpi", font=("Segoe UI", 10)).pack(pady=(10, 5))
+    keep_window("about", top)
+
+def open_stats_window():
+    # Per-profile figures from history.db, refreshed every time it is opened
+    if reuse_window("stats"):
+        return
+    from run_history import format_duration, format_bytes, STATS_RECENT_RUNS
+    root.focus_set()
+    top = tk.Toplevel(root)
+    top.title("Run history")
+    top.iconbitmap(os.path.join(BASE_DIR, "icon.ico"))
+    center_window(top, 970, 360)
+    top.grab_set()
+
+    columns = (('runs', "Runs", 50), ('failures', "Failed", 70), ('stopped', "Stopped", 60),
+               ('p50', "Median", 70), ('p95', "95th pct", 70), ('recent_p50', "Recent median", 95),
+               ('mean_output_bytes', "Avg output", 80), ('mean_cpu_cores', "Avg CPU", 65),
+               ('max_rss', "Peak memory", 85), ('last_run', "Last run", 120))
+    frame = tk.Frame(top)
+    frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+    tree = ttk.Treeview(frame, columns=[c[0] for c in columns])
+    tree.heading('#0', text="Profile", anchor='w')
+    tree.column('#0', width=150, stretch=True)
+    for key, title, width in columns:
+        tree.heading(key, text=title)
+        tree.column(key, width=width, anchor='e', stretch=False)
+    scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    status = tk.Label(top, anchor='w')
+    status.pack(fill=tk.X, padx=10, pady=5)
+
+    def refresh():
+        tree.delete(*tree.get_children())
+        try:
+            history = core.open_history(settings)
+            stats = history.stats() if history else []
+        except Exception as e:
+            status.config(text=f"Could not read the history: {e}")
+            return
+        for s in stats:
+            failed = '-' if s['failure_rate'] is None else f"{s['failures']} ({s['failure_rate']:.0%})"
+            tree.insert('', tk.END, text=s['profile'], values=(
+                s['runs'], failed, s['stopped'], format_duration(s['p50']), format_duration(s['p95']),
+                format_duration(s['recent_p50']), format_bytes(s['mean_output_bytes']),
+                '-' if s['mean_cpu_cores'] is None else f"{s['mean_cpu_cores']:.0%}", format_bytes(s['max_rss']),
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(s['last_run']))))
+        if history is None:
+            status.config(text="The history is off (keep_history in settings.ini).")
+        else:
+            status.config(text=f"{sum(s['runs'] for s in stats)} runs. Recent median: "
+                               f"the last {STATS_RECENT_RUNS} runs of each profile.")
+
+    keep_window("stats", top, refresh)
+    refresh()
 
 def clear_console():
-    console_output.configure(state='normal')
-    console_output.delete("1.0", tk.END)
-    console_output.configure(state='disabled')
-    progressvar.set(0)
+    job = selected_job()
+    if job is None:
+        main_console.clear()
+    else:
+        job.console.clear()
+    update_progress_bar()
+
+def create_console_widget(parent):
+    console = scrolledtext.ScrolledText(
+        parent, wrap=tk.WORD, bg="black", fg="lightgray",
+        insertbackground="white", font=("Consolas", 10)
+    )
+    console.configure(state='disabled') # Disabled to prevent direct typing
+    # Configure tags for different types of output (cmd.exe style colors)
+    console.tag_config("error", foreground="#FF6B6B")      # Light red for errors
+    console.tag_config("warning", foreground="#FFD93D")    # Yellow for warnings  
+    console.tag_config("download", foreground="#6BCF7F")   # Light green for downloads
+    console.tag_config("progress", foreground="#4ECDC4")   # Cyan for progress
+    console.tag_config("info", foreground="lightgray")     # Default light gray
+    console.tag_config("user_input", foreground="#82CFD8") # Color for user's echoed input
+    return console
+
+def selected_job():
+    # The job whose console tab is showing, None for the main "Console" tab
+    tab = console_tabs.select()
+    for job in job_manager.jobs.values():
+        if str(job.tab) == tab:
+            return job
+    return None
+
+def open_job_tab(job):
+    frame = tk.Frame(console_tabs)
+    widget = create_console_widget(frame)
+    widget.pack(fill=tk.BOTH, expand=True)
+    job_bar = tk.Frame(frame)
+    job_bar.pack(fill=tk.X, pady=(5, 0))
+    ttk.Button(job_bar, text="Stop", command=lambda: kill_process(job)).pack(side=tk.LEFT)
+    ttk.Button(job_bar, text="Stop all", command=stop_all_jobs).pack(side=tk.LEFT, padx=(5, 0))
+    ttk.Button(job_bar, text="Close", command=lambda: close_job_tab(job)).pack(side=tk.LEFT, padx=5)
+    job.tab = frame
+    job.console = ConsoleView(widget)
+    console_tabs.add(frame, text=job.title())
+    console_tabs.select(frame)
+
+def update_job_tab(job):
+    if job.tab is not None:
+        console_tabs.tab(job.tab, text=job.title())
+    if job is selected_job():
+        update_progress_bar()
+
+def close_job_tab(job):
+    if job.state == 'running':
+        custom_info_dialog("Info", "Stop the job before closing its tab.")
+        return
+    job_manager.remove(job)
+    ConsoleView.instances.remove(job.console)
+    console_tabs.forget(job.tab)
+    job.tab.destroy()
  
 def center_window_main(win, width=1200, height=600):
     win.update_idletasks()
@@ -1262,72 +1972,694 @@ def center_window_main(win, width=1200, height=600):
 
 # GUI layout
 def refresh_profiles():
-    profile_listbox.delete(0, tk.END)
-    global profile_keys
-    profile_keys = list(profiles.keys())
-    for key in profile_keys:
-        profile_listbox.insert(tk.END, profiles[key]["display_name"])
+    profile_list.update(profile_rows(profiles))
+
+icons = {}
+
+def load_icon(name):
+    # Loaded on first use. The references are kept, or Tk blanks the images
+    if name not in icons:
+        icons[name] = PhotoImage(file=os.path.join(BASE_DIR, name))
+    return icons[name]
 
 def toggle_console():
     if console_visible.get():
         right_frame.pack_forget()
         root.geometry("360x600")
         root.resizable(False, False)
-        toggle_btn.config(image=show_icon)
+        toggle_btn.config(image=load_icon("show.png"))
         console_visible.set(False)
     else:
         # right_frame.pack(fill=tk.BOTH, expand=True)
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=0, pady=6)        
         root.geometry("1200x600")
         root.resizable(True, True)
-        toggle_btn.config(image=hide_icon)
+        toggle_btn.config(image=load_icon("hide.png"))
         console_visible.set(True)
         root.resizable(False, False)
 
-def append_console_output(text, tag=None):
-    # Enable writing to the widget
-    console_output.configure(state='normal')
+# ============ PROFILE LIST ============
+# The search box filters the profiles on shortname, display name and command
+# template. Every space separated term must match: terms of three characters
+# or more anywhere (looked up by trigram, then checked), shorter ones at the
+# start of a word, where flags such as "-i" or "--x" count as words too.
+# Short terms that aren't words, such as "=", match anywhere. Only the
+# profiles that changed are (re)indexed, a few milliseconds at a time
+# between events so a big list doesn't freeze the window; until then they
+# are searched directly.
+# The list itself is virtual: the Listbox only ever holds the rows that fit
+# on screen, and scrolling just swaps them, so thousands of profiles cost
+# nothing to show or filter.
+PROFILE_INDEX_SLICE = 0.008    # seconds of indexing per event loop turn
+PROFILE_INDEX_BULK = 64        # more changes than this: sort the word list once at the end
+PROFILE_WORD = re.compile(r'-{1,2}\w+|\w+')
+
+def profile_words(text):
+    # Flags are indexed with and without their dashes, so "-i" and "i" both find "-i"
+    words = set()
+    for word in PROFILE_WORD.findall(text):
+        words.add(word)
+        words.add(word.lstrip('-'))
+    return words
+
+class ProfileIndex:
+    def __init__(self):
+        self.texts = {}                                 # shortname -> lowercased searchable text
+        self.trigrams = collections.defaultdict(set)    # trigram -> shortnames
+        self.words = {}                                 # word -> shortnames, for short terms
+        self.word_list = []                             # sorted words, None until re-sorted
+
+    @staticmethod
+    def grams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def matches(text, query):
+        # Same rules as search(), on one lowercased text
+        for term in query.lower().split():
+            if len(term) >= 3 or not PROFILE_WORD.fullmatch(term):
+                if term not in text:
+                    return False
+            elif not any(word.startswith(term) for word in profile_words(text)):
+                return False
+        return True
+
+    def add(self, short, text, bulk=False):
+        self.texts[short] = text
+        for gram in self.grams(text):
+            self.trigrams[gram].add(short)
+        if bulk:
+            self.word_list = None
+        for word in profile_words(text):
+            shorts = self.words.get(word)
+            if shorts is None:
+                shorts = self.words[word] = set()
+                if self.word_list is not None:
+                    bisect.insort(self.word_list, word)
+            shorts.add(short)
+
+    def remove(self, short):
+        text = self.texts.pop(short, None)
+        if text is None:
+            return
+        for gram in self.grams(text):
+            shorts = self.trigrams[gram]
+            shorts.discard(short)
+            if not shorts:
+                del self.trigrams[gram]
+        for word in profile_words(text):
+            shorts = self.words[word]
+            shorts.discard(short)
+            if not shorts:
+                del self.words[word]
+                if self.word_list is not None:
+                    del self.word_list[bisect.bisect_left(self.word_list, word)]
+
+    def search(self, query):
+        # Shortnames matching every term, or None for an empty query
+        result = None
+        for term in query.lower().split():
+            if len(term) >= 3:
+                candidates = sorted((self.trigrams.get(gram, set()) for gram in self.grams(term)), key=len)
+                matches = {short for short in candidates[0].intersection(*candidates[1:])
+                           if term in self.texts[short]}
+            elif not PROFILE_WORD.fullmatch(term):
+                matches = {short for short, text in self.texts.items() if term in text}
+            else:
+                if self.word_list is None:
+                    self.word_list = sorted(self.words)
+                matches = set()
+                i = bisect.bisect_left(self.word_list, term)
+                while i < len(self.word_list) and self.word_list[i].startswith(term):
+                    matches |= self.words[self.word_list[i]]
+                    i += 1
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result
+
+
+class ProfileList:
+    def __init__(self, parent):
+        self.index = ProfileIndex()
+        self.indexed = {}       # shortname -> row last seen
+        self.pending = {}       # shortname -> text, waiting to be indexed
+        self.indexing = False
+        self.all_rows = []      # (shortname, display_name) of every profile, in list order
+        self.rows = []          # the ones matching the search
+        self.query = ''
+        self.top = 0            # position in self.rows of the first visible row
+        self.selected = None    # shortname
+
+        xscroll = tk.Scrollbar(parent, orient=tk.HORIZONTAL)
+        xscroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.yscroll = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        self.yscroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(parent, xscrollcommand=xscroll.set, width=40)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        xscroll.config(command=self.listbox.xview)
+        self.row_height = tkFont.nametofont(self.listbox.cget('font')).metrics('linespace') + 1
+
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<Configure>", lambda e: self.render())
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(3))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda e: self.move_selection(-self.visible()))
+        self.listbox.bind("<Next>", lambda e: self.move_selection(self.visible()))
+
+    def update(self, rows):
+        # rows: (shortname, display_name, command_template) of every profile
+        current = {row[0]: row for row in rows}
+        for short in self.indexed.keys() - current.keys():
+            self.index.remove(short)
+            self.pending.pop(short, None)
+        for short, row in current.items():
+            if self.indexed.get(short) != row:
+                self.index.remove(short)
+                self.pending[short] = "\n".join(row).lower()
+        self.indexed = current
+        if self.pending and not self.indexing:
+            self.indexing = True
+            self.listbox.after_idle(self.index_pending)
+        self.all_rows = [(short, name) for short, name, template in rows]
+        if self.selected not in current:
+            self.selected = None
+        self.apply_filter()
+
+    def filter(self, query):
+        if query != self.query:
+            self.query = query
+            self.top = 0
+            self.apply_filter()
+
+    def index_pending(self):
+        deadline = time.perf_counter() + PROFILE_INDEX_SLICE
+        bulk = len(self.pending) > PROFILE_INDEX_BULK
+        while self.pending and time.perf_counter() < deadline:
+            short, text = self.pending.popitem()
+            self.index.add(short, text, bulk)
+        if self.pending:
+            self.listbox.after(1, self.index_pending)
+        else:
+            self.indexing = False
+
+    def apply_filter(self):
+        matches = self.index.search(self.query)
+        if matches is not None and self.pending:
+            matches |= {short for short, text in self.pending.items() if ProfileIndex.matches(text, self.query)}
+        if matches is None:
+            self.rows = self.all_rows
+        else:
+            self.rows = [row for row in self.all_rows if row[0] in matches]
+        self.render()
+
+    def visible(self):
+        return max(1, self.listbox.winfo_height() // self.row_height)
+
+    def render(self):
+        count = self.visible()
+        self.top = max(0, min(self.top, len(self.rows) - count))
+        shown = self.rows[self.top:self.top + count + 1]  # +1: a partly visible last row
+        self.listbox.delete(0, tk.END)
+        if shown:
+            self.listbox.insert(0, *[name for short, name in shown])
+        for i, (short, name) in enumerate(shown):
+            if short == self.selected:
+                self.listbox.selection_set(i)
+                self.listbox.activate(i)
+        if self.rows:
+            self.yscroll.set(self.top / len(self.rows), min(1.0, (self.top + count) / len(self.rows)))
+        else:
+            self.yscroll.set(0.0, 1.0)
 
-    # This regex removes ANSI color codes which can mess up the display
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    clean_text = ansi_escape.sub('', text)
+    def yview(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.top = int(float(amount) * len(self.rows))
+            self.render()
+        else:
+            self.scroll(int(amount) * (self.visible() if unit == 'pages' else 1))
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return "break"
+
+    def on_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection and self.top + selection[0] < len(self.rows):
+            self.selected = self.rows[self.top + selection[0]][0]
+
+    def move_selection(self, step):
+        if not self.rows:
+            return "break"
+        shorts = [short for short, name in self.rows]
+        position = shorts.index(self.selected) if self.selected in shorts else -1
+        position = max(0, min(len(self.rows) - 1, position + step))
+        self.selected = self.rows[position][0]
+        count = self.visible()
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + count:
+            self.top = position - count + 1
+        self.render()
+        return "break"
+
+
+# ============ CONSOLE ============
+# Other threads never touch Tk. Everything they want to show goes through a
+# ConsoleView's queue (or run_on_ui for other widgets) and is applied by
+# pump_console_output, which runs on the main thread every CONSOLE_PUMP_MS.
+CONSOLE_PUMP_MS = 16                # ~one frame
+CONSOLE_QUEUE_CHARS = 4 * 1024 * 1024  # characters waiting for the pump before reading pauses
+CONSOLE_FRAME_BUDGET = 256 * 1024   # characters inserted per frame at most
+CONSOLE_TRIM_SLACK = 0.1            # trim 10% below the scrollback limit at once
+
+ui_calls = queue.Queue()
+
+def run_on_ui(func, *args):
+    ui_calls.put((func, args))
+
+
+# CSI sequences (group 1: parameters, group 2: final byte), OSC strings such as
+# window titles, and the remaining short escapes (charset selection etc.).
+ANSI_SEQUENCE = re.compile(r'\x1b(?:\[([0-?]*)[ -/]*([@-~])|\][^\x07\x1b]*(?:\x07|\x1b\\)|[ -/]*[0-Z\\^-~])')
+ANSI_MAX_SEQUENCE = 64  # an unterminated escape longer than this is dropped
+ANSI_LINE_CONTROLS = 'KAFG'  # erase line, cursor up, previous line, column
+
+# Same palette as the Windows Terminal / VS Code defaults, readable on black
+ANSI_COLORS = [
+    '#0C0C0C', '#CD3131', '#0DBC79', '#E5E510', '#2472C8', '#BC3FBC', '#11A8CD', '#E5E5E5',
+    '#666666', '#F14C4C', '#23D18B', '#F5F543', '#3B8EEA', '#D670D6', '#29B8DB', '#FFFFFF',
+]
+ANSI_CUBE = [0, 95, 135, 175, 215, 255]
+
+def ansi_256_color(n):
+    if n < 16:
+        return ANSI_COLORS[n]
+    if n < 232:
+        n -= 16
+        r, g, b = ANSI_CUBE[n // 36], ANSI_CUBE[n // 6 % 6], ANSI_CUBE[n % 6]
+        return f'#{r:02X}{g:02X}{b:02X}'
+    level = 8 + (n - 232) * 10
+    return f'#{level:02X}{level:02X}{level:02X}'
+
+def ansi_rgb_to_256(r, g, b):
+    # Truecolor is folded into the 256-colour cube so the tag pool stays small
+    def step(v):
+        return 0 if v < 48 else 1 if v < 115 else (v - 35) // 40
+    return 16 + 36 * step(r) + 6 * step(g) + step(b)
+
+
+class AnsiParser:
+    # Streaming SGR parser: turns decoded output into (text, style) segments,
+    # keeping the current style and any escape sequence cut in half by a read
+    # boundary from one feed() to the next. A style is a hashable tuple
+    # (fg, bg, bold, italic, underline, reverse), or None for plain text.
+    # Erase-line and cursor-up/column sequences come out as (None, op); OSC
+    # strings and every other escape are dropped.
+
+    def __init__(self):
+        self.pending = ''
+        self.reset()
+
+    def reset(self):
+        self.fg = self.bg = None
+        self.bold = self.italic = self.underline = self.reverse = False
+
+    def style(self):
+        style = (self.fg, self.bg, self.bold, self.italic, self.underline, self.reverse)
+        return style if any(style) else None
+
+    def feed(self, text):
+        if self.pending:
+            text = self.pending + text
+            self.pending = ''
+        segments = []
+        pos = 0
+        for match in ANSI_SEQUENCE.finditer(text):
+            if match.start() > pos:
+                segments.append((text[pos:match.start()], self.style()))
+            pos = match.end()
+            final = match.group(2)
+            if final == 'm':
+                self.apply_sgr(match.group(1))
+            elif final and final in ANSI_LINE_CONTROLS:
+                op = self.line_control(final, match.group(1))
+                if op:
+                    segments.append((None, op))
+        tail = text.find('\x1b', pos)
+        if tail != -1:
+            if len(text) - tail < ANSI_MAX_SEQUENCE:
+                self.pending = text[tail:]
+            else:
+                tail += 1  # give up on it, drop the ESC and keep the rest
+                if tail > pos + 1:
+                    segments.append((text[pos:tail - 1], self.style()))
+                pos = tail
+                tail = -1
+        end = tail if tail != -1 else len(text)
+        if end > pos:
+            segments.append((text[pos:end], self.style()))
+        return segments
+
+    def line_control(self, final, params):
+        # The few cursor controls progress bars use, as ConsoleView.control ops
+        n = int(params) if params.isdigit() else 0
+        if final == 'K':
+            return ('erase_line', n)
+        if final in 'AF':
+            return ('up', max(n, 1))
+        if final == 'G' and n <= 1:
+            return ('cr',)
+        return None
+
+    def apply_sgr(self, params):
+        codes = [int(c) if c.isdigit() else 0 for c in params.replace(':', ';').split(';')]
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            if code == 0:
+                self.reset()
+            elif code == 1:
+                self.bold = True
+            elif code == 3:
+                self.italic = True
+            elif code == 4:
+                self.underline = True
+            elif code == 7:
+                self.reverse = True
+            elif code == 22:
+                self.bold = False
+            elif code == 23:
+                self.italic = False
+            elif code == 24:
+                self.underline = False
+            elif code == 27:
+                self.reverse = False
+            elif 30 <= code <= 37:
+                self.fg = code - 30
+            elif code == 39:
+                self.fg = None
+            elif 40 <= code <= 47:
+                self.bg = code - 40
+            elif code == 49:
+                self.bg = None
+            elif 90 <= code <= 97:
+                self.fg = code - 90 + 8
+            elif 100 <= code <= 107:
+                self.bg = code - 100 + 8
+            elif code in (38, 48):
+                color = None
+                if i + 2 < len(codes) and codes[i + 1] == 5:
+                    color = min(codes[i + 2], 255)
+                    i += 2
+                elif i + 4 < len(codes) and codes[i + 1] == 2:
+                    color = ansi_rgb_to_256(*(min(c, 255) for c in codes[i + 2:i + 5]))
+                    i += 4
+                if code == 38:
+                    self.fg = color
+                else:
+                    self.bg = color
+            i += 1
 
-    # Insert text and apply the specified tag if any
-    if tag:
-        console_output.insert(tk.END, clean_text, tag)
-    else:
-        # If no tag provided, apply default coloring logic
-        start_pos = console_output.index(tk.INSERT)
-        console_output.insert(tk.END, clean_text)
-        end_pos = console_output.index(tk.INSERT)
-
-        lower_text = clean_text.lower()
-        if any(word in lower_text for word in ['error', 'failed', 'exception']):
-            console_output.tag_add("error", start_pos, end_pos)
-        elif any(word in lower_text for word in ['warning', 'warn']):
-            console_output.tag_add("warning", start_pos, end_pos)
-        elif any(word in lower_text for word in ['downloading', 'download']):
-            console_output.tag_add("download", start_pos, end_pos)
-        elif '[' in clean_text and ']' in clean_text:
-            console_output.tag_add("progress", start_pos, end_pos)
-
-    # Scroll to the end and disable writing again
-    console_output.see(tk.END)
-    console_output.configure(state='disabled')
-    # Force the GUI to update to show the new text immediately
-    root.update_idletasks()
+
+class ConsoleView:
+    instances = []
+
+    def __init__(self, widget):
+        self.widget = widget
+        # Writing never blocks: the runner's loop writes for every job, so
+        # one console that is behind must not hold up the others. Instead
+        # its job stops reading while full() (wait_for_space in reader
+        # threads), so a child that outputs faster than Tk can render ends
+        # up blocking on its pipe instead of growing our memory without limit.
+        self.queue = queue.Queue()
+        self.queued = 0  # characters waiting in the queue
+        self.space = threading.Condition()
+        self.size = 0  # characters currently in the widget
+        # Scrollback limits (0: none), the defaults if settings.ini has no number
+        self.max_lines = core.get_int_setting(settings, 'console_max_lines')
+        self.max_bytes = core.get_int_setting(settings, 'console_max_bytes')
+        self.cr_pending = False  # a \r was seen, the next text rewrites the line
+        self.style_tags = {}  # AnsiParser style -> Tk tag, created on first use
+        self.fonts = []       # keep references, Tk drops a font with its Python object
+        ConsoleView.instances.append(self)
+
+    def write(self, text, tag=None):
+        # Safe to call from any thread, for the application's own messages
+        if text:
+            self._put([(text, tag)])
+
+    def write_segments(self, segments):
+        # Safe to call from any thread, for AnsiParser output
+        if segments:
+            self._put(segments)
+
+    def clear(self):
+        self.queue.put(('clear',))
+
+    def _put(self, segments):
+        size = sum(len(text) for text, _ in segments if text)
+        with self.space:
+            self.queued += size
+        self.queue.put(('segments', segments, size))
+
+    def full(self):
+        return self.queued >= CONSOLE_QUEUE_CHARS
+
+    def wait_for_space(self):
+        # Reader threads, before reading more. Not the main thread: it pumps.
+        with self.space:
+            self.space.wait_for(lambda: not self.full())
+
+    def style_tag(self, style):
+        tag = self.style_tags.get(style)
+        if tag is None:
+            fg, bg, bold, italic, underline, reverse = style
+            fg = ansi_256_color(fg) if fg is not None else None
+            bg = ansi_256_color(bg) if bg is not None else None
+            if reverse:
+                fg, bg = bg or self.widget.cget('bg'), fg or self.widget.cget('fg')
+            tag = f"ansi{len(self.style_tags)}"
+            options = {'underline': underline}
+            if fg:
+                options['foreground'] = fg
+            if bg:
+                options['background'] = bg
+            if bold or italic:
+                font = tkFont.Font(font=self.widget.cget('font'))
+                font.configure(weight='bold' if bold else 'normal',
+                               slant='italic' if italic else 'roman')
+                options['font'] = font
+                self.fonts.append(font)
+            self.widget.tag_config(tag, **options)
+            # ANSI colours go under the application's own tags (e.g. user_input)
+            self.widget.tag_lower(tag)
+            self.style_tags[style] = tag
+        return tag
+
+    def pump(self, budget=CONSOLE_FRAME_BUDGET):
+        # Merge everything that arrived since the last frame into a single
+        # insert call (Text.insert accepts several text/tags pairs), joining
+        # neighbouring segments that end up with the same tag. Progress
+        # redraws (\r, erase-line, cursor-up) are resolved here against the
+        # pending batch first, so a frame with a thousand redraws of the same
+        # line still inserts that line only once.
+        self.batch = []              # [[texts], tag] runs waiting to be inserted
+        self.widget_drop = None      # lines to remove from the widget's end first
+        size = 0
+        while budget is None or size < budget:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == 'clear':
+                self.batch = []
+                self.widget_drop = None
+                self.cr_pending = False
+                size = 0
+                self.size = 0
+                self.widget.configure(state='normal')
+                self.widget.delete("1.0", tk.END)
+                self.widget.configure(state='disabled')
+                continue
+            with self.space:
+                self.queued -= item[2]
+                if not self.full():
+                    self.space.notify_all()
+            for text, tag in item[1]:
+                if text is None:
+                    self.control(tag)
+                    continue
+                if isinstance(tag, tuple):
+                    tag = self.style_tag(tag)
+                if '\r' in text:
+                    for n, part in enumerate(text.split('\r')):
+                        if n:
+                            self.cr_pending = True
+                        if part:
+                            self.add(part, tag)
+                else:
+                    self.add(text, tag)
+                size += len(text)
+
+        if not self.batch and self.widget_drop is None:
+            return
+
+        # Only follow the output if the user has not scrolled up to read something
+        at_bottom = self.widget.yview()[1] >= 1.0
+        args = []
+        for texts, tag in self.batch:
+            text = ''.join(texts)
+            args += [text, (tag,) if tag else ()]
+            self.size += len(text)
+        self.widget.configure(state='normal')
+        if self.widget_drop is not None:
+            start = f"end-1c linestart -{self.widget_drop} lines"
+            self.size -= len(self.widget.get(start, "end-1c"))
+            self.widget.delete(start, "end-1c")
+        if args:
+            self.widget.insert(tk.END, *args)
+        self.trim()
+        self.widget.configure(state='disabled')
+        if at_bottom:
+            self.widget.see(tk.END)
+
+    def add(self, text, tag):
+        if self.cr_pending:
+            # Text after a bare \r rewrites the current line. \r\n is just a newline.
+            if text[0] != '\n':
+                self.drop_lines(0)
+            self.cr_pending = False
+        if self.batch and self.batch[-1][1] == tag:
+            self.batch[-1][0].append(text)
+        else:
+            self.batch.append([[text], tag])
+
+    def drop_lines(self, count):
+        # Remove the current (last) line plus `count` lines above it, leaving
+        # the cursor at the start of an empty line. Whatever is still in the
+        # batch is cut first; the rest is left for pump to delete from the
+        # widget before inserting.
+        needed = count + 1  # newlines to look back past
+        for r in range(len(self.batch) - 1, -1, -1):
+            texts = self.batch[r][0]
+            for t in range(len(texts) - 1, -1, -1):
+                text = texts[t]
+                pos = len(text)
+                while needed:
+                    pos = text.rfind('\n', 0, pos)
+                    if pos == -1:
+                        break
+                    needed -= 1
+                if not needed:
+                    texts[t:] = [text[:pos + 1]]
+                    del self.batch[r + 1:]
+                    return
+        self.batch = []
+        self.widget_drop = (self.widget_drop or 0) + needed - 1
+
+    def control(self, op):
+        # Cursor movement and erase requests from AnsiParser
+        if op[0] == 'cr':
+            self.cr_pending = True
+        elif op[0] == 'erase_line':
+            if op[1] == 2 or (op[1] == 0 and self.cr_pending):
+                self.drop_lines(0)
+                self.cr_pending = False
+        elif op[0] == 'up':
+            self.drop_lines(op[1])
+            self.cr_pending = False
+
+    def trim(self):
+        # Drop the oldest lines once the scrollback limit is exceeded. Trimming
+        # goes a bit below the limit so this runs once in a while as one bulk
+        # delete rather than a line at a time. Tk moves the remaining tag
+        # ranges along with the text, so the colours stay where they were.
+        cut = None
+        if self.max_lines:
+            lines = int(self.widget.index('end-1c').split('.')[0])
+            if lines > self.max_lines:
+                keep = int(self.max_lines * (1 - CONSOLE_TRIM_SLACK))
+                cut = f"{lines - keep + 1}.0"
+        if self.max_bytes and self.size > self.max_bytes:
+            excess = self.size - int(self.max_bytes * (1 - CONSOLE_TRIM_SLACK))
+            byte_cut = self.widget.index(f"1.0 + {excess} chars lineend + 1c")
+            if cut is None or self.widget.compare(byte_cut, '>', cut):
+                cut = byte_cut
+        if cut is None:
+            return
+        self.size -= len(self.widget.get("1.0", cut))
+        self.widget.delete("1.0", cut)
+
+
+def pump_console_output():
+    # Rescheduled whatever happens: a call or a console that fails must not
+    # stop the others (or the jobs waiting for job_finished)
+    try:
+        while True:
+            try:
+                func, args = ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                report_ui_error(getattr(func, '__name__', 'UI update'), e)
+        for console in list(ConsoleView.instances):
+            try:
+                console.pump()
+            except Exception as e:
+                report_ui_error("Console update", e, console)
+    finally:
+        root.after(CONSOLE_PUMP_MS, pump_console_output)
+
+def report_ui_error(what, error, console=None):
+    # On stderr too, in case the main console is the one failing
+    print(f"[ERROR] {what} failed: {error!r}", file=sys.stderr)
+    if console is not main_console:
+        main_console.write(f"[ERROR] {what} failed: {error}\n", "error")
+
+def append_console_output(text, tag=None):
+    main_console.write(text, tag)
+
+# ============ STARTUP PROFILE ============
+# --startup-profile prints how long each phase of the GUI start took, up to
+# the first paint of the main window, then exits (with 1 if the total is over
+# STARTUP_BUDGET_MS) so slow starts are easy to catch.
+startup_phases = []
+
+def startup_phase(name):
+    startup_phases.append((name, time.perf_counter()))
+
+def report_startup():
+    previous = STARTUP_TIME
+    for name, when in startup_phases:
+        print(f"[startup] {name:<14} {(when - previous) * 1000:7.1f} ms")
+        previous = when
+    total = (previous - STARTUP_TIME) * 1000
+    over = total > STARTUP_BUDGET_MS
+    print(f"[startup] {'total':<14} {total:7.1f} ms (budget {STARTUP_BUDGET_MS} ms{', OVER BUDGET' if over else ''})")
+    return 1 if over else 0
 
 if __name__ == "__main__":
     global showtipsvalue
 
+    startup_profile = sys.argv[1:2] == ['--startup-profile']
+    if startup_profile:
+        del sys.argv[1]
+
 # ========= COMMAND-LINE MODE ===========
     if len(sys.argv) > 1:
         shortname = sys.argv[1]
         args = sys.argv[2:]
         try:
-            command = build_command(shortname, args)
-            # CLI mode uses subprocess.run, which inherits terminal (with colors)
-            subprocess.run(command)
+            core.load_config()
+            # CLI mode inherits the terminal (with colors)
+            core.run_local(shortname, args)
         except KeyboardInterrupt:
             # User pressed Ctrl+C. We can exit gracefully without an error message.
             # The newline character \n is to ensure the message appears on a new line after the ^C.
@@ -1339,11 +2671,30 @@ if __name__ == "__main__":
         # print("Provide a profile shortname as first argument if running via command line.")
         
     # ========= GUI MODE ===========
+    # Dialog modules (filedialog, messagebox) are imported where they are used
+    startup_phase("module")
+    import tkinter as tk
+    from tkinter import scrolledtext
+    import tkinter.ttk as ttk
+    from tkinter import PhotoImage
+    import tkinter.font as tkFont
+    import sqlite3
+    startup_phase("gui imports")
+
+    settings = load_settings()
+    profiles = open_profiles(settings)
+    core.settings, core.profiles = settings, profiles  # what build_command uses
+    mark_synced(SETTINGS_FILE)
+    if isinstance(profiles, dict):
+        mark_synced(PROFILE_FILE)
+    startup_phase("config")
+
     root = tk.Tk()
     center_window_main(root, 1200, 600)
     root.title("arGUIments - simplify execution of commands with arguments")
     root.geometry("1200x600")
     root.resizable(False, False)
+    startup_phase("window")
     
     left_frame = tk.Frame(root, width=300)
     left_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
@@ -1383,7 +2734,11 @@ if __name__ == "__main__":
     stop_icon = PhotoImage(file=os.path.join(BASE_DIR, "stop.png"))  # Keep references global    
     stp_btn = ttk.Button(button_frame, image=stop_icon, command=kill_process)
     stp_btn.pack(side=tk.LEFT)
-    Tooltip(stp_btn, "Stop a command", True)  
+    Tooltip(stp_btn, "Stop the selected job", True)  
+
+    stats_btn = ttk.Button(button_frame, image=load_icon("stats.png"), command=open_stats_window)
+    stats_btn.pack(side=tk.LEFT)
+    Tooltip(stats_btn, "Run history and statistics per profile", True)
     
     about_icon = PhotoImage(file=os.path.join(BASE_DIR, "about.png"))  # Keep references global
     about_btn = ttk.Button(button_frame, image=about_icon, command=open_about_window)
@@ -1395,9 +2750,7 @@ if __name__ == "__main__":
     settings_btn.pack(side=tk.LEFT)
     Tooltip(settings_btn, "Settings", True)  
     
-    show_icon = PhotoImage(file=os.path.join(BASE_DIR, "show.png"))  # Keep references global
-    hide_icon = PhotoImage(file=os.path.join(BASE_DIR, "hide.png"))  # Keep references global
-    toggle_btn = ttk.Button(button_frame, image=hide_icon, command=toggle_console)
+    toggle_btn = ttk.Button(button_frame, image=load_icon("hide.png"), command=toggle_console)
     toggle_btn.pack(side=tk.LEFT)
     Tooltip(toggle_btn, "Show/Hide console", True)  
     
@@ -1410,6 +2763,12 @@ if __name__ == "__main__":
     
 
 
+    search_var = tk.StringVar()
+    search_entry = ttk.Entry(left_frame, textvariable=search_var)
+    search_entry.pack(fill=tk.X, pady=(5, 0))
+    search_var.trace_add("write", lambda *args: profile_list.filter(search_var.get()))
+    Tooltip(search_entry, "Search profiles by shortname, name or command. Every word typed must match.", None)
+
     listbox_frame = tk.Frame(left_frame)
     listbox_frame.pack(fill=tk.BOTH, expand=True)
     progress_container = tk.Frame(listbox_frame, height=8)
@@ -1421,38 +2780,19 @@ if __name__ == "__main__":
     progress.pack(side=tk.LEFT, fill=tk.NONE)
     progress.step(0)    
         
-    xscroll = tk.Scrollbar(listbox_frame, orient=tk.HORIZONTAL)
-    xscroll.pack(side=tk.BOTTOM, fill=tk.X)
-    
-    yscroll = tk.Scrollbar(listbox_frame, orient=tk.VERTICAL)
-    yscroll.pack(side=tk.RIGHT, fill=tk.Y)
-
-    profile_listbox = tk.Listbox(
-        listbox_frame,
-        xscrollcommand=xscroll.set,
-        yscrollcommand=yscroll.set,
-        width=40
-    )
-    profile_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    profile_listbox.bind("<Double-Button-1>", on_profile_double_click)
-
-    xscroll.config(command=profile_listbox.xview)
-    yscroll.config(command=profile_listbox.yview)
+    profile_list = ProfileList(listbox_frame)
+    profile_list.listbox.bind("<Double-Button-1>", on_profile_double_click)
 
 
   # --- RIGHT FRAME WIDGETS (CONSOLE) ---
-    console_visible = tk.BooleanVar(value=True)
-    root.iconbitmap(os.path.join(BASE_DIR, "icon.ico"))
-
-    # --- This is the main console output display ---
-    console_output = scrolledtext.ScrolledText(
-        right_frame, wrap=tk.WORD, bg="black", fg="lightgray",
-        insertbackground="white", font=("Consolas", 10)
-    )
-    console_output.pack(fill=tk.BOTH, expand=True)
-    console_output.configure(state='disabled') # Disabled to prevent direct typing
 
+    # --- One tab per job, next to the main console output display ---
+    console_tabs = ttk.Notebook(right_frame)
+    console_tabs.pack(fill=tk.BOTH, expand=True)
+    console_tabs.bind("<<NotebookTabChanged>>", lambda e: update_progress_bar())
 
+    console_output = create_console_widget(console_tabs)
+    console_tabs.add(console_output.frame, text="Console")
     
     console_input_entry = ttk.Entry(
         right_frame,
@@ -1460,22 +2800,30 @@ if __name__ == "__main__":
     )
     console_input_entry.pack(fill=tk.X, pady=(5,0))
     console_input_entry.bind("<Return>", send_to_process) # Bind Enter key
-    Tooltip(console_input_entry, "Command line for console where you can enter text/values/keys when prompted by the command line/software you used." ,None)    
-    console_output.pack(fill=tk.BOTH, expand=True)
-    console_output.configure(state='disabled')
-    # Configure tags for different types of output (cmd.exe style colors)
-    console_output.tag_config("error", foreground="#FF6B6B")      # Light red for errors
-    console_output.tag_config("warning", foreground="#FFD93D")    # Yellow for warnings  
-    console_output.tag_config("download", foreground="#6BCF7F")   # Light green for downloads
-    console_output.tag_config("progress", foreground="#4ECDC4")   # Cyan for progress
-    console_output.tag_config("info", foreground="lightgray")     # Default light gray
-    console_output.tag_config("user_input", foreground="#82CFD8") # Color for user's echoed input
+    Tooltip(console_input_entry, "Command line for console where you can enter text/values/keys when prompted by the command line/software you used. \nThe input goes to the job whose tab is selected." ,None)    
+
+    main_console = ConsoleView(console_output)
+    job_manager = JobManager(JobJournal(JOBS_FILE))
+    root.after(CONSOLE_PUMP_MS, pump_console_output)
+    root.after(CONFIG_WATCH_MS, watch_config_files)
 
 
     style = ttk.Style()
     style.configure('TButton', padding=6, font=('Segoe UI', 10))
+    startup_phase("widgets")
    
     refresh_profiles()
+    startup_phase("profiles")
+
+    if startup_profile:
+        root.wait_visibility(root)
+        root.update_idletasks()
+        startup_phase("first paint")
+        root.destroy()
+        sys.exit(report_startup())
+
+    # Jobs left over from the last session are started once the window is up
+    root.after_idle(job_manager.restore)
 
 
     root.mainloop()   
@@ -36,6 +36,7 @@ image_assets = [
     ('stop.png', '.'),     
     ('run.png', '.'),     
     ('edit.png', '.'),     
+    ('stats.png', '.'),
 ]
 
 
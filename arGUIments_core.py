@@ -0,0 +1,1123 @@
+import os
+import re
+import sys
+import json
+import shlex
+import time
+import queue
+import io
+import codecs
+import signal
+import marshal
+import threading
+import subprocess
+import collections
+import copy
+import atexit
+# Shared by arGUIments.py and arGUIments-console.py, and usable on its own:
+#
+#   import arGUIments_core as core
+#   core.set_config_dir("/path/to/arGUIments")
+#   for kind, value in core.run("yt", ["https://..."]):
+#       ...   # ('out', text), ('err', text), then ('exit', returncode)
+#
+# Keep it free of tkinter and rich: the command line and embedding programs
+# import it, and pay for everything imported here.
+
+
+# ============ FILES ============
+# The GUI keeps its files next to the program, the console script in the
+# current folder. set_config_dir() points all of them at one folder.
+def set_config_dir(path):
+    global PROFILE_FILE, PROFILE_DB, SETTINGS_FILE, CACHE_FILE, LOG_DIR, HISTORY_DB
+    PROFILE_FILE = os.path.join(path, "profiles.json")
+    PROFILE_DB = os.path.join(path, "profiles.db")
+    SETTINGS_FILE = os.path.join(path, "settings.ini")
+    CACHE_FILE = os.path.join(path, "arGUIments.cache")
+    LOG_DIR = os.path.join(path, "logs")  # unless settings.ini has a log_folder
+    HISTORY_DB = os.path.join(path, "history.db")
+
+set_config_dir("")
+
+# Maximum number of bytes pulled from a child's pipe in a single read.
+READ_CHUNK_SIZE = 64 * 1024
+
+# Written to settings.ini when there is none yet
+DEFAULT_SETTINGS = {
+    'software_path': 'yt-dlp',
+    'output_flag': '--output',
+    'output_folder': '',
+    'filename_template': '%(title)s.%(ext)s',
+    'show_hints': 'True',
+    'profile_store': 'json',
+    'max_concurrent_jobs': '4',
+    'console_max_lines': '20000',
+    'console_max_bytes': str(16 * 1024 * 1024),
+    'log_runs': 'True',
+    'log_folder': '',
+    'log_compress': 'False',
+    'log_keep_runs': '200',
+    'log_keep_days': '30',
+    'keep_history': 'True',
+    'stop_interrupt_seconds': '5',
+    'stop_terminate_seconds': '5'
+}
+
+# The configuration build_command() and run() use: set by the entry points,
+# or by load_config() on first use
+settings = None
+profiles = None
+
+
+# ============ SETTINGS AND PROFILES ============
+def get_setting(config, key):
+    # Keys added in later versions are missing from older settings.ini files
+    value = config['DEFAULT'].get(key)
+    return DEFAULT_SETTINGS[key] if value is None else value
+
+def get_flag_setting(config, key):
+    return get_setting(config, key).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_int_setting(config, key):
+    try:
+        return int(get_setting(config, key))
+    except ValueError:
+        return int(DEFAULT_SETTINGS[key])
+
+def load_settings(create=True):
+    import configparser  # only needed here, keeps it off the cached command line path
+    config = configparser.ConfigParser(interpolation=None)
+    if not os.path.exists(SETTINGS_FILE):
+        config['DEFAULT'] = DEFAULT_SETTINGS
+        if create:
+            replace_file(SETTINGS_FILE, config.write)
+    else:
+        config.read(SETTINGS_FILE)
+    return config
+
+def replace_file(path, write):
+    # Written to a temporary file first and renamed over the original, so a
+    # crash leaves either the old or the new version, never a truncated file
+    with open(path + '.tmp', 'w') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def load_profiles():
+    if os.path.exists(PROFILE_FILE):
+        with open(PROFILE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+def open_profiles(config):
+    # profiles.json, or the SQLite store when settings.ini has profile_store = sqlite
+    if config['DEFAULT'].get('profile_store', 'json') != 'sqlite':
+        return load_profiles()
+    from profile_store import ProfileStore
+    first_use = not os.path.exists(PROFILE_DB)
+    store = ProfileStore(PROFILE_DB)
+    if first_use and os.path.exists(PROFILE_FILE):
+        store.import_json(PROFILE_FILE)  # switching over from profiles.json
+    return store
+
+# ============ COMMAND LINE CACHE ============
+# The command line only needs the profiles and the [DEFAULT] settings. They
+# are kept in a marshal file next to profiles.json, keyed on the mtime and size
+# of both files, so a run doesn't parse the JSON and INI files (or import
+# configparser) unless one of them changed. The GUI always reads the files.
+# With the SQLite store only the settings are cached, and profiles are looked
+# up one at a time in profiles.db.
+CACHE_VERSION = 1
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def load_cached_config():
+    stamp = (CACHE_VERSION, file_stamp(PROFILE_FILE), file_stamp(SETTINGS_FILE))
+    try:
+        with open(CACHE_FILE, 'rb') as f:
+            cached = marshal.load(f)
+        if cached[0] == stamp:
+            if cached[2] is None:
+                return cached[1], open_profiles(cached[1])
+            return cached[1], cached[2]
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        pass
+    # Stale or missing: rebuild it. Unlike the GUI, don't create settings.ini
+    cached_settings = {'DEFAULT': dict(load_settings(create=False)['DEFAULT'])}
+    loaded_profiles = open_profiles(cached_settings)
+    cached_profiles = loaded_profiles if isinstance(loaded_profiles, dict) else None
+    try:
+        with open(CACHE_FILE + '.tmp', 'wb') as f:
+            marshal.dump((stamp, cached_settings, cached_profiles), f)
+        os.replace(CACHE_FILE + '.tmp', CACHE_FILE)
+    except OSError:
+        pass  # read-only folder, read the files every time
+    return cached_settings, loaded_profiles
+
+def load_config():
+    # Makes the cached configuration the one build_command() and run() use
+    global settings, profiles
+    settings, profiles = load_cached_config()
+    return settings, profiles
+
+# ============ COMMAND BUILDER ============
+# A profile is compiled once: program path resolved, template split into
+# tokens, output arguments resolved from the settings. build_command then only
+# fills the {0}, {1}... placeholders of the tokens that have them, so each
+# argument stays exactly one argument, spaces and quotes included. The
+# compiled form is reused for as long as the profile and the settings it was
+# built from are unchanged.
+COMPILED_SETTINGS = ('software_path', 'output_flag', 'output_folder', 'filename_template')
+COMPILED_CACHE_SIZE = 1024
+compiled_profiles = collections.OrderedDict()   # shortname -> (profile, settings, compiled), LRU order
+compiled_lock = threading.Lock()
+
+def compile_profile(profile):
+    path_mode = profile.get("path_mode", "default")
+    
+    software_path = None
+    if path_mode == "default":
+        software_path = settings['DEFAULT'].get('software_path')
+    elif path_mode == "custom":
+        software_path = profile.get("program_path")
+    
+    if not software_path:
+        raise ValueError("Software path is not defined in settings or in profile.")
+
+    # (token, True if it has placeholders or {{ }} escapes to format)
+    tokens = [(token, '{' in token or '}' in token) for token in shlex.split(profile['command_template'])]
+
+
+    flag = None
+    exportmode = profile.get("export_output_mode")
+    if exportmode == "default":
+        flag = settings['DEFAULT'].get('output_flag')
+    elif exportmode == "custom":
+        flag = profile.get("custom_output_flag")       
+    
+    folder = None
+    mode = profile.get("export_mode", "default")
+    if mode == "default":
+        folder = settings['DEFAULT'].get('output_folder')
+    elif mode == "software":
+        folder = ''
+    elif mode == "custom":
+        folder = profile.get("custom_output_folder", "")        
+        
+    template = None
+    template_name = profile.get("filename_mode")
+    if template_name == "default":
+        template = settings['DEFAULT'].get('filename_template')
+    elif template_name == "custom":
+        template = profile.get("custom_filename_template")       
+        
+    output = []
+    if exportmode != "disable":
+        if folder == "":
+            output = [flag, f"{template}"]
+        else:
+            output = [flag, f"{folder}/{template}"]
+        
+    return software_path, tokens, output
+
+def fill_command(compiled, user_args):
+    software_path, tokens, output = compiled
+    try:
+        args = [token.format(*user_args) if fields else token for token, fields in tokens]
+    except IndexError as e:
+        raise ValueError(f"Missing arguments: {e}")
+
+    return [software_path] + args + output
+
+def build_command(shortname, user_args):
+    if profiles is None:
+        load_config()
+      
+    profile = profiles.get(shortname)
+    if not profile:
+        raise ValueError("Profile not found.")
+    if is_chain(profile):
+        return chain_command(profile, user_args)
+
+    used = tuple(settings['DEFAULT'].get(key) for key in COMPILED_SETTINGS)
+    with compiled_lock:
+        cached = compiled_profiles.get(shortname)
+        if cached is not None and cached[1] == used and cached[0] == profile:
+            compiled_profiles.move_to_end(shortname)
+            compiled = cached[2]
+        else:
+            compiled = None
+    if compiled is None:
+        compiled = compile_profile(profile)
+        with compiled_lock:
+            compiled_profiles[shortname] = (copy.deepcopy(profile), used, compiled)
+            if len(compiled_profiles) > COMPILED_CACHE_SIZE:
+                compiled_profiles.popitem(last=False)
+
+    return fill_command(compiled, user_args)
+
+def profile_command(profile, user_args):
+    # A shortname, or a profile dict that isn't (or not yet) saved
+    if isinstance(profile, str):
+        return build_command(profile, user_args)
+    if settings is None:
+        load_config()
+    if is_chain(profile):
+        return chain_command(profile, user_args)
+    return fill_command(compile_profile(profile), user_args)
+
+# A chain profile runs other profiles with the stdout of each one connected
+# to the stdin of the next through an OS pipe, like a shell pipeline, so
+# the data goes straight from one program to the other:
+#   {"shortname": "dlcut", "display_name": "Download and cut", "type": "chain",
+#    "arg_names": ["url", "width"],
+#    "stages": [["dl", "{0}", "-"], ["cut", "pipe:0", "{1}"]]}
+# A stage is a shortname followed by the arguments it gets, in which {0},
+# {1}... are the chain's own arguments. Its command is the list of the
+# commands of its stages.
+CHAIN_ARGUMENT = re.compile(r'\{(\d+)\}')
+
+def is_chain(profile):
+    return (profile or {}).get('type') == 'chain'
+
+def is_chain_command(command):
+    return bool(command) and isinstance(command[0], list)
+
+def chain_arg_count(profile):
+    indexes = [int(index) for stage in profile.get('stages') or [] for template in stage[1:]
+               for index in CHAIN_ARGUMENT.findall(template)]
+    return max(indexes) + 1 if indexes else 0
+
+def chain_command(profile, user_args):
+    stages = profile.get('stages') or []
+    if len(stages) < 2:
+        raise ValueError("A chain profile needs at least two stages.")
+    command = []
+    for shortname, *templates in stages:
+        if is_chain(profiles.get(shortname)):
+            raise ValueError(f"Chain stage '{shortname}' is a chain itself.")
+        try:
+            args = [template.format(*user_args) for template in templates]
+        except IndexError as e:
+            raise ValueError(f"Missing arguments: {e}")
+        try:
+            command.append(build_command(shortname, args))
+        except ValueError as e:
+            raise ValueError(f"Chain stage '{shortname}': {e}")
+    return command
+
+def format_command(command):
+    # For the console and the logs
+    if is_chain_command(command):
+        return ' | '.join(shlex.join(stage) for stage in command)
+    return shlex.join(command)
+
+# ============ PROCESSES ============
+def process_group_args():
+    # Popen arguments starting the program in its own process group, so that
+    # stopping it also stops whatever it started
+    if os.name == 'nt':
+        # CREATE_NEW_PROCESS_GROUP is for sending Ctrl+C/signals.
+        # CREATE_NO_WINDOW prevents a new console from popping up for the subprocess.
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW}
+    return {'start_new_session': True}
+
+# Optional profile fields that keep a heavy program from slowing down the
+# rest of the machine, applied when it is started:
+#   "nice": 10                      scheduling priority, -20 (first) to 19 (last);
+#                                   below 0 needs privileges. On Windows it picks
+#                                   the priority class.
+#   "cpu_affinity": [2, 3] or "2-3,6" the cores it may run on (Linux)
+#   "ionice": "idle", "best-effort:7", "realtime:0"
+#                                   disk priority (Linux, through the ionice program)
+#   "limits": {"address_space": "4G", "open_files": 1024, "cpu_seconds": 3600}
+#                                   soft resource limits (not on Windows)
+# Everything is checked before starting, so a mistake in a profile is an
+# error message rather than a program that fails in its preexec_fn. That
+# function runs between fork and exec, where only the prepared system calls
+# are made (no imports, no locks).
+PROFILE_LIMITS = {'address_space': 'RLIMIT_AS', 'open_files': 'RLIMIT_NOFILE', 'cpu_seconds': 'RLIMIT_CPU'}
+IONICE_CLASSES = {'realtime': '1', 'best-effort': '2', 'idle': '3'}
+LIMIT_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_limit_size(value):
+    # 4096, "4096", "512M", "4G": binary units, as ulimit counts
+    text = str(value).strip().upper()
+    unit = LIMIT_SIZE_UNITS.get(text[-1:], 1)
+    if unit != 1:
+        text = text[:-1]
+    try:
+        return int(float(text) * unit)
+    except ValueError:
+        raise ValueError(f"Invalid size '{value}' in the profile limits.")
+
+def parse_cores(value):
+    # [0, 2, 3] or "0,2-3"
+    if isinstance(value, str):
+        cores = set()
+        for part in value.replace(' ', '').split(','):
+            first, _, last = part.partition('-')
+            try:
+                cores.update(range(int(first), int(last or first) + 1))
+            except ValueError:
+                raise ValueError(f"Invalid cpu_affinity '{value}': use core numbers like \"0-3,6\".")
+        return cores
+    return {int(core) for core in value}
+
+def windows_priority(nice):
+    if nice >= 15:
+        return subprocess.IDLE_PRIORITY_CLASS
+    if nice > 0:
+        return subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    if nice <= -15:
+        return subprocess.HIGH_PRIORITY_CLASS
+    if nice < 0:
+        return subprocess.ABOVE_NORMAL_PRIORITY_CLASS
+    return 0
+
+def check_nice(nice):
+    # Raising the priority (going below the current nice level) needs root,
+    # or an RLIMIT_NICE allowing it (ulimit -e); the child could not do it
+    if not -20 <= nice <= 19:
+        raise ValueError(f"Invalid nice {nice}: use -20 (first) to 19 (last).")
+    current = os.nice(0)
+    target = max(-20, min(19, current + nice))
+    if target >= current or os.geteuid() == 0:
+        return
+    import resource
+    allowed = resource.getrlimit(resource.RLIMIT_NICE)[0]
+    if allowed == resource.RLIM_INFINITY or 20 - target <= allowed:
+        return
+    raise ValueError(f"nice {nice} raises the priority, which needs privileges this user doesn't have "
+                     f"(root, or a higher RLIMIT_NICE).")
+
+def apply_profile_limits(profile, command, popen_args):
+    # Adds what the profile's fields above need to popen_args, and returns
+    # the command to start (wrapped in ionice if asked for). profile is a
+    # shortname or a profile dict; without those fields nothing changes.
+    if isinstance(profile, str):
+        profile = (profiles or {}).get(profile)
+    if not profile:
+        return command
+    try:
+        nice = int(profile.get('nice') or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid nice '{profile['nice']}': use a number from -20 to 19.")
+    if os.name == 'nt':
+        if nice:
+            popen_args['creationflags'] = popen_args.get('creationflags', 0) | windows_priority(nice)
+        return command
+
+    steps = []  # (function, arguments) run in the child before exec
+    if nice:
+        check_nice(nice)
+        steps.append((os.nice, (nice,)))
+    if profile.get('cpu_affinity') not in (None, '', []) and hasattr(os, 'sched_setaffinity'):
+        cores = parse_cores(profile['cpu_affinity']) & os.sched_getaffinity(0)
+        if not cores:
+            raise ValueError(f"cpu_affinity {profile['cpu_affinity']} has none of the cores this machine has.")
+        steps.append((os.sched_setaffinity, (0, cores)))
+    if profile.get('limits'):
+        import resource
+        for name, value in profile['limits'].items():
+            if name not in PROFILE_LIMITS:
+                raise ValueError(f"Unknown limit '{name}': use {', '.join(PROFILE_LIMITS)}.")
+            limit = getattr(resource, PROFILE_LIMITS[name])
+            soft = parse_limit_size(value)
+            if soft < 0:
+                raise ValueError(f"Invalid limit {name} '{value}': it can't be negative.")
+            hard = resource.getrlimit(limit)[1]
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            steps.append((resource.setrlimit, (limit, (soft, hard))))
+    if steps:
+        if popen_args.get('preexec_fn'):
+            steps.insert(0, (popen_args['preexec_fn'], ()))
+        def preexec():
+            for function, arguments in steps:
+                function(*arguments)
+        popen_args['preexec_fn'] = preexec
+
+    if profile.get('ionice') and sys.platform.startswith('linux'):
+        kind, _, level = str(profile['ionice']).partition(':')
+        if kind not in IONICE_CLASSES or (level and level not in list('01234567')):
+            raise ValueError(f"Invalid ionice '{profile['ionice']}': use idle, best-effort[:0-7] or realtime[:0-7].")
+        if kind == 'realtime' and os.geteuid() != 0:
+            raise ValueError(f"ionice '{profile['ionice']}': the realtime class needs root.")
+        # ionice execs the program, which keeps its pid (and process group)
+        prefix = ['ionice', '-c', IONICE_CLASSES[kind]] + (['-n', level] if level and kind != 'idle' else [])
+        command = prefix + ['--'] + list(command)
+    return command
+
+def start_program(profile, command, popen_args):
+    # Starts a profile's command with popen_args (what Popen would get) and
+    # the limits of the profile, or of each stage of a chain. Returns the
+    # Popen, or a ProcessChain for a chain.
+    if is_chain_command(command):
+        return start_chain(profile, command, dict(popen_args))
+    command = apply_profile_limits(profile, command, popen_args)
+    return subprocess.Popen(command, **popen_args)
+
+class ProcessChain:
+    # The running stages of a chain, with what callers use of a Popen: pid
+    # (the first stage, leader of the process group if there is one),
+    # stdin of the first stage, stdout of the last one, the stderr all of
+    # them share, returncode, wait() and kill(). The exit code is the last
+    # non-zero one of the stages (like "set -o pipefail"): a download that
+    # failed counts even if the stage reading it exits cleanly.
+    def __init__(self, processes, names):
+        self.processes = processes
+        self.names = names
+        self.stdin = self.stdout = self.stderr = None
+
+    @property
+    def pid(self):
+        return self.processes[0].pid
+
+    @property
+    def returncode(self):
+        codes = [p.returncode for p in self.processes]
+        if None in codes:
+            return None
+        return next((code for code in reversed(codes) if code), 0)
+
+    def poll(self):
+        for p in self.processes:
+            p.poll()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for p in self.processes:
+            p.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+        return self.returncode
+
+    def kill(self):
+        for p in self.processes:
+            if p.returncode is None:
+                p.kill()
+
+    def status(self):
+        return ', '.join(f"{name} exited with {p.returncode}" for name, p in zip(self.names, self.processes))
+
+def start_chain(profile, command, popen_args):
+    stdin = popen_args.pop('stdin', None)
+    stdout = popen_args.pop('stdout', None)
+    stderr = popen_args.pop('stderr', None)
+    popen_args.pop('bufsize', None)
+    # A process can only join a group of its own session, so the stages get
+    # a new process group of this session rather than a session of their own
+    new_group = popen_args.pop('start_new_session', False)
+    if isinstance(profile, str):
+        profile = (profiles or {}).get(profile)
+    stages = [stage[0] for stage in (profile or {}).get('stages') or []]
+    if len(stages) != len(command):
+        stages = [None] * len(command)  # resumed job: run without the stages' limits
+    names = [name or os.path.basename(stage[0]) for name, stage in zip(stages, command)]
+
+    child_ends = []   # pipe ends the stages use, closed here once they are started
+    parent_ends = []  # (attribute of the chain, fd, mode)
+    if stdin == subprocess.PIPE:
+        stdin, write_end = os.pipe()
+        child_ends.append(stdin)
+        parent_ends.append(('stdin', write_end, 'wb'))
+    if stdout == subprocess.PIPE:
+        read_end, stdout = os.pipe()
+        child_ends.append(stdout)
+        parent_ends.append(('stdout', read_end, 'rb'))
+    if stderr == subprocess.STDOUT:
+        stderr = stdout
+    elif stderr == subprocess.PIPE:
+        read_end, stderr = os.pipe()
+        child_ends.append(stderr)
+        parent_ends.append(('stderr', read_end, 'rb'))
+
+    processes = []
+    try:
+        previous = stdin
+        for n, (name, stage_command) in enumerate(zip(stages, command)):
+            if n < len(command) - 1:
+                next_stdin, output = os.pipe()
+                child_ends += [next_stdin, output]
+            else:
+                next_stdin, output = None, stdout
+            args = dict(popen_args)
+            if new_group:
+                # The later stages join the first one's group, so stopping
+                # the group stops the whole chain
+                pgid = processes[0].pid if processes else 0
+                args['preexec_fn'] = lambda pgid=pgid: os.setpgid(0, pgid)
+            stage_command = apply_profile_limits(name, stage_command, args)
+            processes.append(subprocess.Popen(stage_command, stdin=previous, stdout=output, stderr=stderr, **args))
+            previous = next_stdin
+    except BaseException:
+        for p in processes:
+            p.kill()
+            p.wait()
+        for _, fd, _ in parent_ends:
+            os.close(fd)
+        raise
+    finally:
+        # Only the stages may keep these: a writer left open here would
+        # keep the next stage from ever seeing the end of its input
+        for fd in child_ends:
+            os.close(fd)
+
+    chain = ProcessChain(processes, names)
+    for attribute, fd, mode in parent_ends:
+        setattr(chain, attribute, os.fdopen(fd, mode, buffering=0 if attribute == 'stdin' else -1))
+    return chain
+
+def kill_process_group(process):
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == 'nt':
+            for p in getattr(process, 'processes', [process]):
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(p.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+# What wait_process reports about a finished program (from wait4's rusage):
+# CPU seconds, peak memory in bytes, blocks read/written by the filesystem,
+# and context switches, voluntary ones (waiting for I/O, a lock, a pipe...)
+# or forced by the scheduler (other processes wanting the CPU). Covers the
+# program and those of its children it waited for.
+RUSAGE_FIELDS = ('user_time', 'system_time', 'max_rss', 'read_blocks', 'written_blocks',
+                 'voluntary_switches', 'involuntary_switches')
+
+def wait_process(process):
+    # Reaps the program with os.wait4 and returns its resource usage, or
+    # None where there is no wait4 (Windows). Sets process.returncode like
+    # Popen.wait() does. While it waits, other threads should only look at
+    # process.returncode: a poll() could reap the program first, and its
+    # usage would be lost. A ProcessChain waits for every stage.
+    if isinstance(process, ProcessChain):
+        return combine_usage([wait_process(p) for p in process.processes])
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    try:
+        pid, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()  # reaped elsewhere after all
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    max_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return dict(zip(RUSAGE_FIELDS, (usage.ru_utime, usage.ru_stime, max_rss, usage.ru_inblock,
+                                    usage.ru_oublock, usage.ru_nvcsw, usage.ru_nivcsw)))
+
+def combine_usage(usages):
+    # Of the stages of a chain. They run at the same time, so their peak
+    # memory is added up too (an upper bound of the chain's peak).
+    if not usages or None in usages:
+        return None
+    return {field: sum(usage[field] for usage in usages) for field in RUSAGE_FIELDS}
+
+def format_usage(usage, duration=None):
+    if not usage:
+        return None
+    cpu = usage['user_time'] + usage['system_time']
+    share = f" ({cpu / duration:.0%} of {duration:.1f}s)" if duration else ""
+    memory = usage['max_rss'] / (1024 * 1024)
+    return (f"CPU {usage['user_time']:.2f}s user + {usage['system_time']:.2f}s system{share}, "
+            f"peak memory {memory:.1f}MiB, {usage['read_blocks']} blocks read, "
+            f"{usage['written_blocks']} written, {usage['voluntary_switches']} voluntary and "
+            f"{usage['involuntary_switches']} involuntary context switches")
+
+def text_decoder():
+    # Decodes a pipe's output chunk by chunk (decode(data, final=not data)).
+    # It keeps multi-byte characters split across two reads intact, and holds
+    # back a trailing \r so a \r\n split by a read is not mistaken for a
+    # progress redraw.
+    return io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder('utf-8')(errors='replace'), translate=False)
+
+def read_text(pipe, tee=None):
+    # Yields the text of a binary pipe as it arrives. os.read returns as soon
+    # as the pipe has *some* data (up to READ_CHUNK_SIZE bytes), so partial
+    # lines such as interactive prompts come through right away. tee, if
+    # given, gets the raw bytes first.
+    decoder = text_decoder()
+    fd = pipe.fileno()
+    while True:
+        data = os.read(fd, READ_CHUNK_SIZE)
+        if tee and data:
+            tee(data)
+        text = decoder.decode(data, final=not data)
+        if text:
+            yield text
+        if not data:  # End of stream
+            return
+
+# ============ RUN LOGS ============
+# Each run's output is kept in its own log file (unless log_runs is off): the
+# raw bytes of stdout and stderr in the order they were read, between a
+# header with the command and a footer with the exit code. Readers only
+# queue the bytes. One writer thread does all the file work (opening,
+# large buffered or gzip'ed writes, removing old logs), so a slow disk never
+# holds up a reader, and through it the program or the GUI. If the writer
+# falls LOG_MAX_PENDING bytes behind, output is left out of the log (which
+# says how much) rather than making the reader wait.
+LOG_BUFFER_SIZE = 1024 * 1024
+LOG_MAX_PENDING = 64 * 1024 * 1024
+LOG_COMPRESS_LEVEL = 1  # fastest; output text still shrinks several times
+
+class RunLog:
+    def __init__(self, path, compress):
+        self.path = path
+        self.compress = compress
+        self.file = None
+        self.dropped = 0     # bytes left out because the writer was behind
+        self.started = time.time()
+
+    def write(self, data):
+        # Safe to call from any thread
+        log_writer.put(self, data)
+
+    def close(self, returncode=None):
+        log_writer.put(self, ('close', returncode))
+
+    def open(self, command):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if self.compress:
+            import gzip
+            self.file = gzip.open(self.path, 'wb', compresslevel=LOG_COMPRESS_LEVEL)
+        else:
+            self.file = open(self.path, 'wb', buffering=LOG_BUFFER_SIZE)
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))
+        self.file.write(f"[Command: {format_command(command)}]\n[Started: {started}]\n\n".encode())
+
+    def finish(self, returncode):
+        if self.dropped:
+            self.file.write(f"\n[{self.dropped} bytes of output were not logged: the disk was too slow]\n".encode())
+        if returncode is not None:
+            duration = time.time() - self.started
+            self.file.write(f"\n[Process exited with code: {returncode} after {duration:.1f}s]\n".encode())
+        self.file.close()
+        self.file = None
+
+
+class LogWriter:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = 0     # bytes queued and not written yet
+        self.thread = None
+        self.open_logs = set()
+
+    def put(self, log, item):
+        with self.lock:
+            if isinstance(item, bytes):
+                if self.pending + len(item) > LOG_MAX_PENDING:
+                    log.dropped += len(item)
+                    return
+                self.pending += len(item)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        self.queue.put((log, item))
+
+    def call(self, func, *args):
+        # Other slow file work (e.g. recording a run in the history) done
+        # on the writer thread, in order with the logs
+        self.put(None, ('call', func) + args)
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Whatever piled up meanwhile goes out as one write per log
+            chunks = []
+            for n, (log, item) in enumerate(items):
+                if isinstance(item, bytes):
+                    chunks.append(item)
+                    if n + 1 < len(items) and items[n + 1][0] is log and isinstance(items[n + 1][1], bytes):
+                        continue
+                    data = b''.join(chunks)
+                    chunks = []
+                    with self.lock:
+                        self.pending -= len(data)
+                    if log.file:
+                        try:
+                            log.file.write(data)
+                        except OSError:
+                            log.dropped += len(data)
+                elif item is None:
+                    self.close_all()
+                    return
+                else:
+                    self.handle(log, item)
+
+    def handle(self, log, item):
+        try:
+            if item[0] == 'open':
+                log.open(item[1])
+                self.open_logs.add(log)
+                prune_logs(*item[2:])
+            elif item[0] == 'close' and log.file:
+                self.open_logs.discard(log)
+                log.finish(item[1])
+            elif item[0] == 'call':
+                item[1](*item[2:])
+        except OSError:
+            pass  # no log then, the run itself goes on
+
+    def stop(self):
+        # At exit: write out and close the logs of runs still going
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put((None, None))
+            self.thread.join(timeout=5)
+
+    def close_all(self):
+        for log in list(self.open_logs):
+            try:
+                log.finish(None)
+            except OSError:
+                pass
+        self.open_logs.clear()
+
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
+
+def open_run_log(config, name, job_id, command):
+    # A RunLog for a run that is about to start, or None with log_runs off
+    if not get_flag_setting(config, 'log_runs'):
+        return None
+    folder = get_setting(config, 'log_folder') or LOG_DIR
+    compress = get_flag_setting(config, 'log_compress')
+    safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{job_id}.log" + ('.gz' if compress else '')
+    log = RunLog(os.path.join(folder, filename), compress)
+    log_writer.put(log, ('open', command, folder,
+                         get_int_setting(config, 'log_keep_runs'), get_int_setting(config, 'log_keep_days')))
+    return log
+
+# The names open_run_log gives: only those are ever pruned, log_folder may
+# be a folder other programs write logs to as well
+RUN_LOG_NAME = re.compile(r'\d{8}-\d{6}-[\w.-]+-\d+\.log(?:\.gz)?')
+
+def prune_logs(folder, keep_runs, keep_days):
+    # Keep the newest keep_runs logs, none older than keep_days (0: no limit)
+    try:
+        logs = [entry for entry in os.scandir(folder)
+                if RUN_LOG_NAME.fullmatch(entry.name) and entry.is_file()]
+    except OSError:
+        return
+    logs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    cutoff = time.time() - keep_days * 86400
+    for n, entry in enumerate(logs):
+        if (keep_runs and n >= keep_runs) or (keep_days and entry.stat().st_mtime < cutoff):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+# ============ RUN HISTORY ============
+# history.db (see run_history.py), opened by whichever part first records or
+# reads a run, then shared by all threads
+history = None
+history_lock = threading.Lock()
+
+def open_history(config):
+    # The RunHistory, or None when keep_history is off
+    global history
+    if not get_flag_setting(config, 'keep_history'):
+        return None
+    with history_lock:
+        if history is None:
+            from run_history import RunHistory
+            history = RunHistory(HISTORY_DB)
+    return history
+
+def record_run(config, name, args, command, started, returncode, output_bytes=None, stopped=False, usage=None,
+               finished=None):
+    history = open_history(config)
+    if history:
+        history.record(name, args, command, started, finished or time.time(), returncode, output_bytes, stopped,
+                       usage)
+
+def record_run_or_warn(name, args, command, started, returncode, output_bytes=None, stopped=False, usage=None):
+    # For the command line: a locked or read-only history.db must not fail the run itself
+    try:
+        record_run(settings, name, args, command, started, returncode, output_bytes, stopped, usage)
+    except Exception as e:
+        print(f"[WARNING] Run not recorded in the history: {e}", file=sys.stderr)
+
+def run_local(shortname, args):
+    # Runs a profile in this terminal, which it inherits (with colours and
+    # input), and returns its exit code. Used by both command lines.
+    command = build_command(shortname, args)
+    started = time.time()
+    try:
+        process = start_program(shortname, command, {})
+    except (OSError, ValueError, subprocess.SubprocessError):
+        record_run_or_warn(shortname, args, command, started, None)
+        raise
+    try:
+        usage = wait_process(process)
+    except KeyboardInterrupt:
+        # The program got the Ctrl+C too; give it a moment, as subprocess.run does
+        try:
+            process.wait(timeout=0.25)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        record_run_or_warn(shortname, args, command, started, None, stopped=True)
+        raise
+    if isinstance(process, ProcessChain):
+        print(f"[Stages: {process.status()}]", file=sys.stderr)
+    record_run_or_warn(shortname, args, command, started, process.returncode, usage=usage)
+    return process.returncode
+
+# ============ RUN ============
+# run() yields ('out', text) and ('err', text) as the program writes, then
+# ('exit', returncode). profile is a shortname or a profile dict. Leaving the
+# loop early (break, exception, close()) kills the program and everything it
+# started. run_async() is the same for asyncio code.
+RUN_DRAIN_TIMEOUT = 1  # seconds to wait for output after the program exited
+
+def run(profile, args=(), cwd=None):
+    command = profile_command(profile, list(args))
+    popen_args = dict(process_group_args(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                      stderr=subprocess.PIPE, cwd=cwd)
+    process = start_program(profile, command, popen_args)
+    chunks = queue.Queue()
+
+    def pump(pipe, kind):
+        try:
+            for text in read_text(pipe):
+                chunks.put((kind, text))
+        except OSError:
+            pass
+        finally:
+            pipe.close()
+            chunks.put((kind, None))
+
+    for pipe, kind in ((process.stdout, 'out'), (process.stderr, 'err')):
+        threading.Thread(target=pump, args=(pipe, kind), daemon=True).start()
+    try:
+        open_streams = 2
+        deadline = None
+        while open_streams:
+            try:
+                kind, text = chunks.get(timeout=0.1)
+            except queue.Empty:
+                # A grandchild that inherited the pipes may keep them open
+                # long after the program itself exited
+                if deadline is None and process.poll() is not None:
+                    deadline = time.monotonic() + RUN_DRAIN_TIMEOUT
+                elif deadline is not None and time.monotonic() > deadline:
+                    break
+                continue
+            if text is None:
+                open_streams -= 1
+            else:
+                yield kind, text
+        yield 'exit', process.wait()
+    finally:
+        kill_process_group(process)
+        process.wait()
+
+async def run_async(profile, args=(), cwd=None):
+    import asyncio
+    command = profile_command(profile, list(args))
+    if is_chain_command(command):
+        raise ValueError("run_async doesn't run chain profiles; use run.")
+    popen_args = process_group_args()
+    command = apply_profile_limits(profile, command, popen_args)
+    process = await asyncio.create_subprocess_exec(
+        *command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, cwd=cwd, **popen_args)
+    chunks = asyncio.Queue()
+
+    async def pump(stream, kind):
+        decoder = text_decoder()
+        try:
+            while True:
+                data = await stream.read(READ_CHUNK_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    await chunks.put((kind, text))
+                if not data:
+                    break
+        finally:
+            await chunks.put((kind, None))
+
+    pumps = [asyncio.ensure_future(pump(process.stdout, 'out')),
+             asyncio.ensure_future(pump(process.stderr, 'err'))]
+    try:
+        open_streams = 2
+        while open_streams:
+            kind, text = await chunks.get()
+            if text is None:
+                open_streams -= 1
+            else:
+                yield kind, text
+        yield 'exit', await process.wait()
+    finally:
+        for task in pumps:
+            task.cancel()
+        if process.returncode is None:
+            kill_process_group(process)
+            await process.wait()
+
+# ============ PROCESS RUNNER ============
+# One asyncio event loop, in one background thread, reads the pipes of every
+# program it watches and notices when each exits, so many programs running
+# at once cost no thread each and nothing polls. Pipes are made
+# non-blocking and read when the loop reports them readable. The exit comes
+# through a pidfd (Linux), which becomes readable when the program exits;
+# the program is then reaped with wait_process, for its resource usage.
+# Without pidfd (macOS, older Linux) a thread per program waits for its
+# exit. The loop cannot watch Windows pipes: RUNNER_SUPPORTED is False
+# there and callers keep their reader threads.
+RUNNER_SUPPORTED = os.name != 'nt'
+RUNNER_RETRY_DELAY = 0.02  # seconds before a paused pipe is looked at again
+
+class ProcessRunner:
+    def __init__(self):
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def call(self, func, *args):
+        # Runs func(*args) on the loop's thread; safe to call from any thread
+        with self.lock:
+            if self.loop is None:
+                import asyncio
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def watch(self, process, output, finished, ready=None):
+        # Loop thread only. output(name, data) gets each chunk read from
+        # 'stdout' and 'stderr', then b'' once at the end of each.
+        # finished(usage) is called once the program exited and its pipes
+        # are drained, or RUN_DRAIN_TIMEOUT after the exit (a grandchild may
+        # keep them open). While ready() is False nothing is read, which
+        # leaves the program blocked on a full pipe.
+        WatchedProcess(self.loop, process, output, finished, ready).start()
+
+
+class WatchedProcess:
+    def __init__(self, loop, process, output, finished, ready):
+        self.loop = loop
+        self.process = process
+        self.output = output
+        self.finished = finished
+        self.ready = ready
+        self.pipes = {}          # fd -> (name, pipe) still open
+        self.paused = set()      # fds not read until ready() is True again
+        self.pidfds = {}         # pidfd -> process not reaped yet
+        self.usages = []
+        self.exited = False
+        self.done = False
+        self.usage = None
+        self.drain_timer = None
+
+    def start(self):
+        for name in ('stdout', 'stderr'):
+            pipe = getattr(self.process, name)
+            if pipe is not None:
+                fd = pipe.fileno()
+                os.set_blocking(fd, False)
+                self.pipes[fd] = (name, pipe)
+                self.loop.add_reader(fd, self.read, fd)
+        if hasattr(os, 'pidfd_open'):
+            # One for each stage of a chain
+            try:
+                for process in getattr(self.process, 'processes', [self.process]):
+                    self.pidfds[os.pidfd_open(process.pid)] = process
+            except OSError:  # kernel older than 5.3
+                for pidfd in self.pidfds:
+                    os.close(pidfd)
+                self.pidfds = {}
+        if self.pidfds:
+            for pidfd in self.pidfds:
+                self.loop.add_reader(pidfd, self.reap, pidfd)
+        else:
+            threading.Thread(target=self.wait, daemon=True).start()
+
+    def read(self, fd):
+        if self.ready and not self.ready():
+            self.loop.remove_reader(fd)
+            self.paused.add(fd)
+            self.loop.call_later(RUNNER_RETRY_DELAY, self.resume, fd)
+            return
+        try:
+            data = os.read(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        name = self.pipes[fd][0]
+        self.output(name, data)
+        if not data:
+            self.close_pipe(fd)
+
+    def resume(self, fd):
+        self.paused.discard(fd)
+        if fd in self.pipes:
+            self.loop.add_reader(fd, self.read, fd)
+
+    def close_pipe(self, fd):
+        name, pipe = self.pipes.pop(fd)
+        self.loop.remove_reader(fd)
+        pipe.close()
+        self.check_done()
+
+    def reap(self, pidfd):
+        # The pidfd is readable: the program exited, wait4 won't block
+        self.loop.remove_reader(pidfd)
+        os.close(pidfd)
+        self.usages.append(wait_process(self.pidfds.pop(pidfd)))
+        if not self.pidfds:
+            self.exit(combine_usage(self.usages))
+
+    def wait(self):
+        # Thread, without pidfd
+        usage = wait_process(self.process)
+        self.loop.call_soon_threadsafe(self.exit, usage)
+
+    def exit(self, usage):
+        self.exited = True
+        self.usage = usage
+        if self.pipes:
+            self.drain_timer = self.loop.call_later(RUN_DRAIN_TIMEOUT, self.stop_draining)
+        self.check_done()
+
+    def stop_draining(self):
+        if self.paused:
+            # Output we have yet to take, not a grandchild holding the pipe
+            self.drain_timer = self.loop.call_later(RUN_DRAIN_TIMEOUT, self.stop_draining)
+            return
+        self.drain_timer = None
+        for fd in list(self.pipes):
+            self.output(self.pipes[fd][0], b'')
+            self.close_pipe(fd)
+
+    def check_done(self):
+        if self.exited and not self.pipes and not self.done:
+            self.done = True
+            if self.drain_timer:
+                self.drain_timer.cancel()
+                self.drain_timer = None
+            self.finished(self.usage)
+
+
+process_runner = ProcessRunner()
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+# Synthetic child process for the benchmarks: writes output of a given shape
+# to stdout, as fast as possible or at a given rate, so that readers and the
+# console can be measured without a real program (or a network) behind them.
+#
+#   lines     80 character lines
+#   long      lines of --line-length characters
+#   progress  yt-dlp style "\r[download]  42.0% ..." redraws of one line
+#   ansi      coloured lines (SGR sequences, 256 colours, bold)
+#   prompt    partial lines ending in a prompt, no newline
+#   mixed     all of the above in turn
+#   latency   one line per --rate lines/second carrying the time it was
+#             written (time.perf_counter_ns, same clock in every process)
+
+SHAPES = ('lines', 'long', 'progress', 'ansi', 'prompt', 'mixed', 'latency')
+WRITE_SIZE = 4096  # bytes per write, about what a program flushing its stdio buffer writes
+
+def make_line(shape, line_length, n):
+    if shape == 'lines':
+        return f"{n:08d} " + 'x' * 70 + '\n'
+    if shape == 'long':
+        return f"{n:08d} " + 'y' * max(0, line_length - 10) + '\n'
+    if shape == 'progress':
+        line = f"\r[download] {n % 1000 / 10:5.1f}% of ~ 120.00MiB at  3.10MiB/s ETA 00:{n % 60:02d} (frag {n % 20}/20)"
+        return line + '\n' if n % 1000 == 999 else line
+    if shape == 'ansi':
+        return (f"\x1b[1;3{n % 8}m{n:08d}\x1b[0m \x1b[38;5;{n % 256}mcolour {n % 256}\x1b[0m "
+                f"\x1b[4mplain\x1b[24m " + 'z' * 30 + '\n')
+    if shape == 'prompt':
+        return f"{n:08d} Continue with item {n}? [y/N] "
+    # mixed: the shapes above in turn, long lines kept to 1 KiB
+    return make_line(SHAPES[n % 5], min(line_length, 1024), n)
+
+def make_block(shape, line_length, n):
+    # About 64 KiB of output of the given shape, n numbering the lines
+    out = []
+    size = 0
+    while size < 64 * 1024:
+        line = make_line(shape, line_length, n)
+        out.append(line)
+        size += len(line)
+        n += 1
+    return ''.join(out).encode(), n
+
+def emit(shape, total, rate, line_length):
+    fd = sys.stdout.fileno()
+    started = time.perf_counter()
+    written = 0
+    n = 0
+    if shape == 'latency':
+        # rate is in lines per second here
+        interval = 1 / (rate or 100)
+        while written < total:
+            next_at = started + n * interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            line = f"@{time.perf_counter_ns()} {n}\n".encode()
+            os.write(fd, line)
+            written += len(line)
+            n += 1
+        return
+    # Built once and written over and over, so generating the output never
+    # limits how fast it can be read
+    block, n = make_block(shape, line_length, n)
+    while written < total:
+        for start in range(0, len(block), WRITE_SIZE):
+            data = block[start:start + WRITE_SIZE][:total - written]
+            if not data:
+                break
+            if rate:
+                # Stay on schedule: sleep until this byte is due
+                delay = started + written / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            os.write(fd, data)
+            written += len(data)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic output for the benchmarks.")
+    parser.add_argument('shape', choices=SHAPES)
+    parser.add_argument('--bytes', type=int, default=16 * 1024 * 1024, help="total output size")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="bytes per second, lines per second for latency (0: as fast as possible)")
+    parser.add_argument('--line-length', type=int, default=64 * 1024, help="line length of the long shape")
+    args = parser.parse_args()
+    try:
+        emit(args.shape, args.bytes, args.rate, args.line_length)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import shlex
+import statistics
+import configparser
+# Offline benchmarks for the parts of arGUIments that decide how fast output
+# and commands go through: building commands, reading a child's pipes,
+# getting output to the reader, and inserting it into the Tk console.
+#
+#   python benchmarks/run_benchmarks.py                  all of them, results/<date>.json
+#   python benchmarks/run_benchmarks.py --quick          smaller sizes, a few seconds
+#   python benchmarks/run_benchmarks.py --only reader_throughput,latency
+#   python benchmarks/run_benchmarks.py --compare results/before.json
+#
+# Rates (*_per_s) are better when higher, times (*_ms) when lower. The Tk
+# benchmark needs a display: without one, Xvfb is started if it is installed,
+# otherwise the benchmark is skipped and listed as such in the results.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import arGUIments_core as core
+import emitter
+
+EMITTER = os.path.join(HERE, 'emitter.py')
+RESULTS_DIR = os.path.join(HERE, 'results')
+MB = 1024 * 1024
+
+BENCHMARKS = []  # (name, function), in the order they run
+
+def benchmark(func):
+    BENCHMARKS.append((func.__name__.replace('bench_', '', 1), func))
+    return func
+
+class Skip(Exception):
+    pass
+
+def rate(func, seconds):
+    # Calls per second of func, in batches so the timer isn't what is measured
+    calls = 0
+    batch = 1000
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return round(calls / elapsed)
+
+def percentiles(values):
+    values = sorted(values)
+    return {
+        'p50_ms': round(statistics.median(values), 3),
+        'p95_ms': round(values[int(len(values) * 0.95)], 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+def spawn_emitter(shape, size, rate=0):
+    return subprocess.Popen([sys.executable, EMITTER, shape, '--bytes', str(size), '--rate', str(rate)],
+                            stdout=subprocess.PIPE, bufsize=0)
+
+def load_gui():
+    # The GUI script only imports tkinter in its main block, so it can be
+    # imported for its classes. ConsoleView reads the console limits from
+    # the settings, which are the defaults here.
+    import arGUIments as gui
+    config = configparser.ConfigParser(interpolation=None)
+    config['DEFAULT'] = core.DEFAULT_SETTINGS
+    gui.settings = config
+    return gui
+
+
+# ============ BENCHMARKS ============
+SAMPLE_PROFILES = {
+    'dl': {"display_name": "DL", "shortname": "dl", "path_mode": "default",
+           "command_template": "-f 'bv*+ba/b' --embed-subs --retries {1} {0}", "arg_names": ["url", "retries"],
+           "export_output_mode": "default", "export_mode": "default", "filename_mode": "default"},
+    'cut': {"display_name": "Cut", "shortname": "cut", "path_mode": "custom", "program_path": "ffmpeg",
+            "command_template": "-i {0} -vf \"scale={1}:-2\" -c:a copy out.mp4", "arg_names": ["input", "width"],
+            "export_output_mode": "disable"},
+}
+
+@benchmark
+def bench_build_command(quick):
+    seconds = 0.3 if quick else 1.0
+    config = configparser.ConfigParser(interpolation=None)
+    config['DEFAULT'] = core.DEFAULT_SETTINGS
+    saved = core.settings, core.profiles
+    try:
+        core.profiles = SAMPLE_PROFILES
+        results = {}
+        # The GUI keeps a ConfigParser, the command line a plain dict
+        for name, settings in (('configparser', config), ('dict', {'DEFAULT': dict(config['DEFAULT'])})):
+            core.settings = settings
+            results[f'{name}_calls_per_s'] = rate(
+                lambda: core.build_command('dl', ['https://example.com/watch?v=1', '3']), seconds)
+        results['custom_path_calls_per_s'] = rate(
+            lambda: core.build_command('cut', ['in.mkv', '720']), seconds)
+        # Without the compiled profile cache: what every call used to cost
+        profile = SAMPLE_PROFILES['dl']
+        results['uncached_calls_per_s'] = rate(
+            lambda: core.fill_command(core.compile_profile(profile), ['https://example.com', '3']), seconds)
+        return results
+    finally:
+        core.settings, core.profiles = saved
+
+@benchmark
+def bench_reader_throughput(quick):
+    # core.read_text alone, then with what the GUI does to each chunk (colour parsing and progress extraction), per output shape
+    gui = load_gui()
+    size = (8 if quick else 64) * MB
+    results = {}
+    for shape in ('lines', 'long', 'progress', 'ansi', 'prompt', 'mixed'):
+        for pipeline in ('raw', 'gui'):
+            process = spawn_emitter(shape, size)
+            parser = gui.AnsiParser()
+            extractor = gui.YtDlpProgress(time.monotonic())
+            received = 0
+            started = time.perf_counter()
+            for text in core.read_text(process.stdout):
+                received += len(text)
+                if pipeline == 'gui':
+                    segments = parser.feed(text)
+                    extractor.feed(gui.progress_text(segments))
+            elapsed = time.perf_counter() - started
+            process.wait()
+            process.stdout.close()
+            results[f'{shape}_{pipeline}_mb_per_s'] = round(received / MB / elapsed, 1)
+    return results
+
+@benchmark
+def bench_latency(quick):
+    # Time from the child writing a line to core.run handing it over, with
+    # the child writing LINES_PER_S lines a second. The emitter stamps each
+    # line with time.perf_counter_ns, which is the same clock in every process.
+    lines_per_s = 200
+    seconds = 1 if quick else 5
+    line_size = len(f"@{time.perf_counter_ns()} {lines_per_s * seconds}\n")
+    profile = {'path_mode': 'custom', 'program_path': sys.executable, 'export_output_mode': 'disable',
+               'command_template': f"{shlex.quote(EMITTER)} latency --rate {lines_per_s} --bytes {line_size * lines_per_s * seconds}"}
+    latencies = []
+    pending = ''
+    saved = core.settings
+    core.settings = {'DEFAULT': dict(core.DEFAULT_SETTINGS)}  # not the user's settings.ini
+    try:
+        for kind, value in core.run(profile):
+            now = time.perf_counter_ns()
+            if kind != 'out':
+                continue
+            *lines, pending = (pending + value).split('\n')
+            for line in lines:
+                if line.startswith('@'):
+                    latencies.append((now - int(line[1:].split()[0])) / 1e6)
+    finally:
+        core.settings = saved
+    if not latencies:
+        raise Skip("the emitter produced no output")
+    return dict(percentiles(latencies), lines=len(latencies))
+
+@benchmark
+def bench_runner_concurrency(quick):
+    # Many programs at once through core.process_runner, the way the GUI
+    # runs its jobs: total throughput, and how many threads it took
+    if not core.RUNNER_SUPPORTED:
+        raise Skip("the process runner is not used on this platform")
+    import threading
+    jobs = 20 if quick else 200
+    size = MB
+    done = threading.Event()
+    received = [0]
+    remaining = [jobs]
+    peak_threads = threading.active_count()
+
+    def output(name, data):
+        received[0] += len(data)
+
+    def finished(usage):
+        remaining[0] -= 1
+        if not remaining[0]:
+            done.set()
+
+    def start_all():
+        for _ in range(jobs):
+            core.process_runner.watch(spawn_emitter('lines', size), output, finished)
+
+    started = time.perf_counter()
+    core.process_runner.call(start_all)
+    while not done.wait(0.05):
+        peak_threads = max(peak_threads, threading.active_count())
+    elapsed = time.perf_counter() - started
+    return {'jobs': jobs, 'mb_per_s': round(received[0] / MB / elapsed, 1),
+            'peak_threads': peak_threads}
+
+@benchmark
+def bench_tk_insert(quick):
+    # ConsoleView.pump, which does every Tk insert of the console, fed with
+    # parsed output of each shape the way the job output handlers feed it. Each
+    # pump is one frame; the idle tasks after it (layout, redraw) count too.
+    display = start_display()
+    try:
+        import tkinter as tk
+        from tkinter import scrolledtext
+        import tkinter.font as tkFont
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            raise Skip(f"Tk cannot open a window: {e}")
+        gui = load_gui()
+        gui.tk, gui.scrolledtext, gui.tkFont, gui.root = tk, scrolledtext, tkFont, root
+        try:
+            root.geometry("1200x600")
+            widget = gui.create_console_widget(root)
+            widget.pack(fill=tk.BOTH, expand=True)
+            root.update()
+            console = gui.ConsoleView(widget)
+            size = (2 if quick else 16) * MB
+            results = {}
+            for shape in ('lines', 'long', 'progress', 'ansi', 'mixed'):
+                block = emitter.make_block(shape, 64 * 1024, 0)[0].decode()
+                segments = gui.AnsiParser().feed(block)  # parsing is reader_throughput's
+                console.clear()
+                console.pump()
+                frames = []
+                inserted = 0
+                started = time.perf_counter()
+                while inserted < size:
+                    # 1 MB at a time, well under what pauses reading
+                    for _ in range(16):
+                        console.write_segments(segments)
+                        inserted += len(block)
+                    while not console.queue.empty():
+                        frame_started = time.perf_counter()
+                        console.pump()
+                        root.update_idletasks()
+                        frames.append((time.perf_counter() - frame_started) * 1000)
+                elapsed = time.perf_counter() - started
+                results[f'{shape}_mb_per_s'] = round(inserted / MB / elapsed, 1)
+                results[f'{shape}_frame_p95_ms'] = percentiles(frames)['p95_ms']
+            return results
+        finally:
+            root.destroy()
+    finally:
+        if display:
+            display.terminate()
+            display.wait()
+
+def start_display():
+    # Returns the Xvfb process started for the benchmark, if one was needed
+    if os.name == 'nt' or sys.platform == 'darwin' or os.environ.get('DISPLAY'):
+        return None
+    xvfb = shutil.which('Xvfb')
+    if not xvfb:
+        raise Skip("no display, and Xvfb is not installed")
+    # -displayfd: Xvfb picks a free display number and writes it to the pipe
+    read_end, write_end = os.pipe()
+    server = subprocess.Popen([xvfb, '-displayfd', str(write_end), '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                              pass_fds=(write_end,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        number = f.readline().strip()
+    if not number:
+        server.wait()
+        raise Skip("Xvfb did not start")
+    os.environ['DISPLAY'] = f':{number}'
+    return server
+
+
+# ============ RESULTS ============
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(names, quick):
+    report = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': quick,
+        'results': {},
+        'skipped': {},
+    }
+    for name, func in BENCHMARKS:
+        if names and name not in names:
+            continue
+        print(f"{name}...", flush=True)
+        try:
+            report['results'][name] = func(quick)
+        except Skip as e:
+            report['skipped'][name] = str(e)
+            print(f"  skipped: {e}")
+            continue
+        for metric, value in report['results'][name].items():
+            print(f"  {metric}: {value}")
+    return report
+
+def compare(old, new):
+    # Change of every metric found in both reports, signed so that positive
+    # is always an improvement
+    print(f"\n{'metric':48} {'before':>12} {'after':>12} {'change':>8}")
+    for name, metrics in new['results'].items():
+        for metric, value in metrics.items():
+            before = old.get('results', {}).get(name, {}).get(metric)
+            if not before or not metric.endswith(('_per_s', '_ms')):
+                continue
+            change = (value - before) / before * 100
+            if metric.endswith('_ms'):
+                change = -change
+            print(f"{name + '.' + metric:48} {before:>12} {value:>12} {change:>+7.1f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the arGUIments benchmarks and save the results as JSON.")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and shorter runs")
+    parser.add_argument('--only', default='', help="comma separated benchmarks: " +
+                        ', '.join(name for name, _ in BENCHMARKS))
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<date>.json)")
+    parser.add_argument('--compare', metavar='FILE', help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    names = [n for n in args.only.split(',') if n]
+    unknown = set(names) - {name for name, _ in BENCHMARKS}
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    report = run_benchmarks(names, args.quick)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
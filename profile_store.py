@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+# ============ SQLITE PROFILE STORE =============
+# Drop-in replacement for the profiles dict, used when settings.ini has
+# profile_store = sqlite. Every assignment or deletion is a single-row upsert
+# or delete committed right away, and a lookup reads only the one row asked
+# for, so neither depends on how many profiles there are. Profiles keep the
+# order they were added in, like profiles.json. The profile itself is stored
+# as its JSON text, so import/export to profiles.json is lossless.
+
+
+class ProfileStore(MutableMapping):
+    UPSERT = """INSERT INTO profiles (shortname, display_name, data) VALUES (?, ?, ?)
+                ON CONFLICT (shortname) DO UPDATE SET display_name = excluded.display_name, data = excluded.data"""
+
+    def __init__(self, path):
+        # Shared with the console daemon's worker threads, hence the lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # position is the rowid: kept by upserts, so it is the insertion order
+        self.db.execute("""CREATE TABLE IF NOT EXISTS profiles (
+            position INTEGER PRIMARY KEY,
+            shortname TEXT NOT NULL UNIQUE,
+            display_name TEXT NOT NULL DEFAULT '',
+            data TEXT NOT NULL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS profiles_display_name ON profiles (display_name)")
+        self.db.commit()
+        self.data_version = self.query("PRAGMA data_version")[0][0]
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def __getitem__(self, shortname):
+        rows = self.query("SELECT data FROM profiles WHERE shortname = ?", (shortname,))
+        if not rows:
+            raise KeyError(shortname)
+        return json.loads(rows[0][0])
+
+    def __setitem__(self, shortname, profile):
+        with self.lock, self.db:
+            self.db.execute(self.UPSERT, self.row(shortname, profile))
+
+    def __delitem__(self, shortname):
+        with self.lock, self.db:
+            if not self.db.execute("DELETE FROM profiles WHERE shortname = ?", (shortname,)).rowcount:
+                raise KeyError(shortname)
+
+    def __contains__(self, shortname):
+        return bool(self.query("SELECT 1 FROM profiles WHERE shortname = ?", (shortname,)))
+
+    def __iter__(self):
+        return iter([row[0] for row in self.query("SELECT shortname FROM profiles ORDER BY position")])
+
+    def __len__(self):
+        return self.query("SELECT COUNT(*) FROM profiles")[0][0]
+
+    def changed_elsewhere(self):
+        # True once another connection (another process) has committed since
+        # the last call. Changes made through this object don't count
+        version = self.query("PRAGMA data_version")[0][0]
+        changed, self.data_version = version != self.data_version, version
+        return changed
+
+    def rows(self):
+        # (shortname, display_name, command_template) for every profile, in order
+        return self.query("""SELECT shortname, display_name, COALESCE(json_extract(data, '$.command_template'), '')
+                             FROM profiles ORDER BY position""")
+
+    @staticmethod
+    def row(shortname, profile):
+        return shortname, str(profile.get("display_name", "")), json.dumps(profile)
+
+    def import_json(self, path):
+        # Adds (or replaces) the profiles of a profiles.json file in one transaction
+        with open(path, 'r') as f:
+            profiles = json.load(f)
+        with self.lock, self.db:
+            self.db.executemany(self.UPSERT, [self.row(short, profile) for short, profile in profiles.items()])
+        return len(profiles)
+
+    def export_json(self, path):
+        # Same layout as the profiles.json written by the GUI
+        rows = self.query("SELECT shortname, data FROM profiles ORDER BY position")
+        profiles = {short: json.loads(data) for short, data in rows}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(profiles, f, indent=2)
+        os.replace(path + '.tmp', path)
+        return len(profiles)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,160 @@
+import json
+import time
+import sqlite3
+import threading
+
+# ============ RUN HISTORY =============
+# Every finished run (GUI job, console run, batch line or daemon request) is
+# one row of history.db: profile, arguments, command, start and end time,
+# exit code, bytes of output, whether the user stopped it and, where wait4
+# exists, its resource usage. stats() turns them into per-profile figures:
+# duration percentiles over all runs and over the most recent ones (a slower
+# recent p50 is a profile getting slower), failure rate, CPU and memory use
+# and so on. Runs the user stopped are counted, but left out of durations
+# and failures.
+STATS_RECENT_RUNS = 20
+
+# Resource usage columns, as in arGUIments_core.RUSAGE_FIELDS. Added to
+# databases created before they existed.
+USAGE_COLUMNS = (('user_time', 'REAL'), ('system_time', 'REAL'), ('max_rss', 'INTEGER'),
+                 ('read_blocks', 'INTEGER'), ('written_blocks', 'INTEGER'),
+                 ('voluntary_switches', 'INTEGER'), ('involuntary_switches', 'INTEGER'))
+
+
+class RunHistory:
+    def __init__(self, path):
+        # Shared with the console's batch and daemon threads, hence the lock
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            profile TEXT NOT NULL,
+            args TEXT,
+            command TEXT NOT NULL,
+            started REAL NOT NULL,
+            finished REAL NOT NULL,
+            returncode INTEGER,
+            output_bytes INTEGER,
+            stopped INTEGER NOT NULL DEFAULT 0)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile, started)")
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(runs)")}
+        for name, kind in USAGE_COLUMNS:
+            if name not in existing:
+                self.db.execute(f"ALTER TABLE runs ADD COLUMN {name} {kind}")
+        self.db.commit()
+
+    def record(self, profile, args, command, started, finished, returncode, output_bytes=None, stopped=False,
+               usage=None):
+        # returncode None: the program could not be started (or its exit
+        # code is unknown), which counts as a failure. usage: the dict
+        # arGUIments_core.wait_process returns, if any.
+        usage = usage or {}
+        columns = ', '.join(name for name, _ in USAGE_COLUMNS)
+        with self.lock, self.db:
+            self.db.execute(f"""INSERT INTO runs (profile, args, command, started, finished, returncode,
+                                                  output_bytes, stopped, {columns})
+                                VALUES ({', '.join('?' * (8 + len(USAGE_COLUMNS)))})""",
+                            (profile, None if args is None else json.dumps(args), json.dumps(command),
+                             started, finished, returncode, output_bytes, int(bool(stopped)),
+                             *(usage.get(name) for name, _ in USAGE_COLUMNS)))
+
+    def recent(self, profile, limit=20):
+        # The last runs of one profile, newest first
+        with self.lock:
+            rows = self.db.execute(f"""SELECT started, finished, returncode, output_bytes, stopped, args,
+                                              {', '.join(name for name, _ in USAGE_COLUMNS)}
+                                       FROM runs WHERE profile = ? ORDER BY started DESC LIMIT ?""",
+                                   (profile, limit)).fetchall()
+        runs = []
+        for started, finished, returncode, output_bytes, stopped, args, *usage in rows:
+            runs.append({'started': started, 'duration': finished - started, 'returncode': returncode,
+                         'output_bytes': output_bytes, 'stopped': bool(stopped),
+                         'args': json.loads(args) if args else None,
+                         'usage': dict(zip((name for name, _ in USAGE_COLUMNS), usage)) if usage[0] is not None else None})
+        return runs
+
+    def stats(self, profile=None, days=None):
+        # One dict per profile, the most run first. Optionally only one
+        # profile, and only runs started in the last `days` days.
+        conditions, params = [], []
+        if profile is not None:
+            conditions.append("profile = ?")
+            params.append(profile)
+        if days:
+            conditions.append("started >= ?")
+            params.append(time.time() - days * 86400)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.db.execute(f"""SELECT profile, finished - started, returncode, output_bytes, stopped, started,
+                                              user_time + system_time, max_rss
+                                       FROM runs {where} ORDER BY profile, started""", params).fetchall()
+        stats = []
+        start = 0
+        while start < len(rows):
+            end = start
+            while end < len(rows) and rows[end][0] == rows[start][0]:
+                end += 1
+            stats.append(self.summarize(rows[start][0], rows[start:end]))
+            start = end
+        stats.sort(key=lambda s: (-s['runs'], s['profile']))
+        return stats
+
+    @staticmethod
+    def summarize(profile, rows):
+        # rows: (profile, duration, returncode, output_bytes, stopped, started,
+        # cpu time, max_rss), oldest first
+        completed = [row for row in rows if not row[4]]
+        durations = [row[1] for row in completed]
+        failures = sum(1 for row in completed if row[2] != 0)
+        output = [row[3] for row in completed if row[3] is not None]
+        # CPU time per second of run time: how many cores a run keeps busy
+        cores = [row[6] / row[1] for row in completed if row[6] is not None and row[1] > 0]
+        memory = [row[7] for row in rows if row[7] is not None]
+        return {
+            'profile': profile,
+            'runs': len(rows),
+            'stopped': len(rows) - len(completed),
+            'failures': failures,
+            'failure_rate': failures / len(completed) if completed else None,
+            'p50': percentile(durations, 0.5),
+            'p95': percentile(durations, 0.95),
+            'recent_p50': percentile(durations[-STATS_RECENT_RUNS:], 0.5),
+            'mean_output_bytes': sum(output) / len(output) if output else None,
+            'mean_cpu_cores': sum(cores) / len(cores) if cores else None,
+            'max_rss': max(memory) if memory else None,
+            'last_run': rows[-1][5],
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile, None without values
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+    return f"{int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m"
+
+def format_bytes(value):
+    if value is None:
+        return '-'
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TiB"